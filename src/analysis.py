@@ -0,0 +1,304 @@
+"""
+Análisis de sensibilidad por barrido de escenarios
+
+Un escenario es un diccionario con cambios sobre el grafo base; todas las
+claves son opcionales:
+
+    {
+        "quantity": {"Instancia 1": 120.0},          # cantidad por nodo
+        "factors": {"Diesel (L)": 2.8},              # factor por tipo de energía
+        "co2_limits": {"Instancia 1": (0, 400)},     # límites por nodo
+        "inv_limits": {"Instancia 1": (0, 900)},
+        "carbon_weight": 0.6, "cost_weight": 0.4,    # pesos AHP
+        "t_norm_type": "einstein", "p_value": 0.5
+    }
+
+ScenarioSweep arma una sola vez la estructura (nodos, caminos candidatos y
+matriz de incidencia camino-nodo) y evalúa todos los escenarios juntos con
+NumPy: pesos de nodo (escenarios x nodos), emisiones por camino con
+np.add.reduceat y evaluación difusa en lote. grid() arma escenarios por
+producto cartesiano y sample() por Monte-Carlo. uncertainty() propaga
+ruido en cantidades y factores hasta la distribución de emisiones de cada
+camino.
+"""
+from itertools import product
+
+import numpy as np
+
+import backend
+import model
+
+def grid(**axes):
+    """Escenarios del producto cartesiano de los valores de cada parámetro"""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in product(*(axes[name] for name in names))]
+
+def _lognormal(rng, shape, cv):
+    """Factores multiplicativos lognormales de media 1 y coeficiente de variación cv"""
+    sigma = np.sqrt(np.log1p(np.square(cv)))
+    return rng.lognormal(-np.square(sigma) / 2, sigma, shape)
+
+def sample(count, distributions, seed=0):
+    """
+    Escenarios Monte-Carlo
+    
+    distributions tiene las mismas claves que un escenario; cada valor es una
+    función (rng, count) -> array, o un diccionario de esas funciones para las
+    claves por nodo o por tipo de energía (quantity, factors). Por ejemplo:
+        {"quantity": {"Instancia 1": lambda rng, n: rng.normal(100, 10, n)},
+         "carbon_weight": lambda rng, n: rng.uniform(0.3, 0.7, n)}
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for key, distribution in distributions.items():
+        if isinstance(distribution, dict):
+            columns[key] = {name: np.asarray(draw(rng, count)) for name, draw in distribution.items()}
+        else:
+            columns[key] = np.asarray(distribution(rng, count))
+    
+    scenarios = []
+    for i in range(count):
+        scenario = {}
+        for key, values in columns.items():
+            if isinstance(values, dict):
+                scenario[key] = {name: values[name][i].item() for name in values}
+            else:
+                scenario[key] = values[i].item()
+        scenarios.append(scenario)
+    return scenarios
+
+class ScenarioSweep:
+    """Evaluación en lote de muchos escenarios sobre la misma estructura de grafo"""
+    def __init__(self, graph, factor_set=None, max_paths=10000, pool_size=200):
+        self.data = backend.Data(graph, factor_set)
+        self.factor_set = self.data.factor_set
+        nodes = graph['nodes']
+        
+        # Atributos base por nodo
+        self.normal = np.array([node['type'] == 'normal' for node in nodes], dtype=bool)
+        self.quantity = np.array([node.get('quantity', 0.0) for node in nodes], dtype=float)
+        self.co2_limits = np.array(self.data.node_co2_limits, dtype=float).reshape(-1, 2)
+        self.inv_limits = np.array(self.data.node_inv_limits, dtype=float).reshape(-1, 2)
+        self.investment = np.array(self.data.node_investments, dtype=float)
+        
+        # Tipos de energía: los del conjunto de factores y los desconocidos del grafo
+        self.energy_types = list(self.factor_set.energy_types)
+        self.energy_codes = {energy_type: code for code, energy_type in enumerate(self.energy_types)}
+        for node in nodes:
+            energy_type = node.get('energy_type', 'N/A')
+            if energy_type not in self.energy_codes:
+                self.energy_codes[energy_type] = len(self.energy_types)
+                self.energy_types.append(energy_type)
+        self.codes = np.array([self.energy_codes[node.get('energy_type', 'N/A')] for node in nodes], dtype=np.int64)
+        self.factors = np.array([self.factor_set.factors.get(energy_type, 0.0)
+                                 for energy_type in self.energy_types], dtype=float)
+        
+        self.paths, self.exhaustive = self._candidate_paths(max_paths, pool_size)
+        self._build_incidence()
+    
+    def _candidate_paths(self, max_paths, pool_size):
+        """Todos los caminos (Data._enumerate_paths) si no superan max_paths; si no, los mejores del grafo base"""
+        data = self.data
+        paths = data._enumerate_paths(max_paths)
+        exhaustive = paths is not None
+        if not exhaustive:
+            paths = [tuple(path) for path in data._fuzzy_candidates(pool_size)]
+        # Orden por nombres: el desempate final coincide con el de Data.get_ranking
+        paths.sort(key=lambda path: [data.node_names[node_id] for node_id in path])
+        return paths, exhaustive
+    
+    def _build_incidence(self):
+        """Matriz de incidencia camino-nodo en formato compacto (ids + offsets por camino)"""
+        lengths = np.array([len(path) for path in self.paths], dtype=np.int64)
+        self.path_lengths = lengths
+        self.hops = lengths - 2
+        self.path_ids = np.fromiter((node_id for path in self.paths for node_id in path),
+                                    dtype=np.int64, count=int(lengths.sum()))
+        self.path_offsets = np.zeros(len(self.paths), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=self.path_offsets[1:])
+    
+    def _aggregate(self, values):
+        """Suma por camino de valores por nodo (el último eje son los nodos)"""
+        if not len(self.paths):
+            return np.zeros(values.shape[:-1] + (0,))
+        return np.add.reduceat(values[..., self.path_ids], self.path_offsets, axis=-1)
+    
+    def _node_matrix(self, scenarios, key, base):
+        """Valores por nodo de cada escenario (escenarios x nodos) con los cambios aplicados"""
+        matrix = np.tile(base, (len(scenarios),) + (1,) * base.ndim)
+        for i, scenario in enumerate(scenarios):
+            for name, value in scenario.get(key, {}).items():
+                matrix[i, self.data.node_ids[name]] = value
+        return matrix
+    
+    def node_weights(self, scenarios):
+        """Emisiones por nodo de cada escenario (escenarios x nodos)"""
+        quantity = self._node_matrix(scenarios, 'quantity', self.quantity)
+        factors = np.tile(self.factors, (len(scenarios), 1))
+        for i, scenario in enumerate(scenarios):
+            for energy_type, factor in scenario.get('factors', {}).items():
+                if energy_type in self.energy_codes:
+                    factors[i, self.energy_codes[energy_type]] = factor
+        return np.where(self.normal, quantity * factors[:, self.codes], 0.0)
+    
+    def evaluate(self, scenarios):
+        """
+        Evalúa todos los escenarios sobre los caminos candidatos
+        
+        Devuelve arreglos (escenarios x caminos) de emisiones y evaluación
+        difusa, y la inversión por camino (no depende del escenario).
+        """
+        emissions = self._aggregate(self.node_weights(scenarios))
+        investment = self._aggregate(self.investment)
+        
+        if any('co2_limits' in scenario for scenario in scenarios):
+            co2_limits = self._aggregate(np.moveaxis(self._node_matrix(scenarios, 'co2_limits', self.co2_limits), -1, 1))
+        else:
+            co2_limits = self._aggregate(self.co2_limits.T)[None]
+        if any('inv_limits' in scenario for scenario in scenarios):
+            inv_limits = self._aggregate(np.moveaxis(self._node_matrix(scenarios, 'inv_limits', self.inv_limits), -1, 1))
+        else:
+            inv_limits = self._aggregate(self.inv_limits.T)[None]
+        
+        carbon_weight = np.array([[scenario.get('carbon_weight', 0.5)] for scenario in scenarios])
+        cost_weight = np.array([[scenario.get('cost_weight', 0.5)] for scenario in scenarios])
+        p_value = np.array([[scenario.get('p_value', 0.5)] for scenario in scenarios])
+        t_norms = np.array([scenario.get('t_norm_type', 'algebraic') for scenario in scenarios])
+        
+        # Una evaluación en lote por cada t-norma usada
+        score = np.empty_like(emissions)
+        for t_norm_type in np.unique(t_norms):
+            rows = np.flatnonzero(t_norms == t_norm_type)
+            co2 = co2_limits[rows] if len(co2_limits) > 1 else co2_limits
+            inv = inv_limits[rows] if len(inv_limits) > 1 else inv_limits
+            score[rows] = model.evaluate_carbon_investment_batch(
+                emissions[rows], investment,
+                co2[:, 0], co2[:, 1], inv[:, 0], inv[:, 1],
+                carbon_weight[rows], cost_weight[rows],
+                t_norm_type=str(t_norm_type), p_value=p_value[rows]
+            )
+        return {'emissions': emissions, 'investment': investment, 'score': score}
+    
+    def rank(self, scenarios, mode="emissions"):
+        """Orden de los caminos en cada escenario (escenarios x caminos, índices de self.paths)"""
+        results = self.evaluate(scenarios)
+        emissions = results['emissions']
+        hops = np.broadcast_to(self.hops, emissions.shape)
+        if mode == "emissions":
+            keys = (hops, emissions)
+        elif mode == "fuzzy":
+            # Límites degenerados dan nan: esos caminos quedan al final
+            keys = (hops, emissions, -np.nan_to_num(results['score'], nan=-np.inf))
+        else:
+            raise ValueError(f"Modo de ranking no válido: {mode}")
+        # lexsort es estable: los empates quedan en el orden por nombres de self.paths
+        return np.lexsort(keys, axis=-1), results
+    
+    def stability(self, scenarios, top_n=5, mode="emissions"):
+        """
+        Estabilidad del ranking: qué tan seguido cada camino entra al top-k
+        
+        Devuelve, para cada camino que aparece en algún top-k, la fracción de
+        escenarios en que entra al top-k y en que es el mejor, su posición
+        media y sus emisiones (media, mínimo y máximo), ordenados por
+        frecuencia en el top-k.
+        """
+        if not scenarios or not len(self.paths):
+            return []
+        order, results = self.rank(scenarios, mode)
+        count = len(scenarios)
+        rows = np.arange(count)[:, None]
+        positions = np.empty_like(order)
+        positions[rows, order] = np.arange(order.shape[1])
+        
+        top = order[:, :top_n]
+        top_k_counts = np.bincount(top.ravel(), minlength=len(self.paths))
+        best_counts = np.bincount(order[:, 0], minlength=len(self.paths))
+        emissions = results['emissions']
+        
+        stats = []
+        for i in np.flatnonzero(top_k_counts).tolist():
+            stats.append({
+                'path': [self.data.node_names[node_id] for node_id in self.paths[i]],
+                'top_k_frequency': float(top_k_counts[i] / count),
+                'best_frequency': float(best_counts[i] / count),
+                'mean_rank': float(positions[:, i].mean()) + 1,
+                'mean_emissions': float(emissions[:, i].mean()),
+                'min_emissions': float(emissions[:, i].min()),
+                'max_emissions': float(emissions[:, i].max()),
+                'nodes': int(self.hops[i])
+            })
+        stats.sort(key=lambda x: (-x['top_k_frequency'], x['mean_rank']))
+        return stats
+    
+    def _incidence_matrix(self):
+        """Incidencia densa (nodos usados x caminos) y los ids de esos nodos"""
+        used, local = np.unique(self.path_ids, return_inverse=True)
+        incidence = np.zeros((len(used), len(self.paths)))
+        np.add.at(incidence, (local, np.repeat(np.arange(len(self.paths)), self.path_lengths)), 1.0)
+        return used, incidence
+    
+    def _per_item(self, value, names, ids):
+        """Arreglo por nodo o por tipo de energía a partir de un escalar o un diccionario"""
+        if not isinstance(value, dict):
+            return np.full(len(names), float(value))
+        values = np.zeros(len(names))
+        for name, item in value.items():
+            values[ids[name]] = item
+        return values
+    
+    def sample_path_emissions(self, samples=10000, quantity_cv=0.1, factor_cv=0.05,
+                              seed=0, chunk_size=2000):
+        """
+        Emisiones por camino de samples realizaciones (samples x caminos)
+        
+        Cantidades (por nodo) y factores (por tipo de energía, compartidos por
+        los nodos del mismo tipo) se multiplican por ruido lognormal de media
+        1; quantity_cv y factor_cv son escalares o diccionarios por nombre.
+        Sólo se muestrean los nodos que están en algún camino candidato y las
+        emisiones salen de un producto por la matriz de incidencia, por
+        bloques de chunk_size muestras.
+        """
+        rng = np.random.default_rng(seed)
+        used, incidence = self._incidence_matrix()
+        base = np.where(self.normal, self.quantity, 0.0)[used]
+        node_cv = self._per_item(quantity_cv, self.data.node_names, self.data.node_ids)[used]
+        type_cv = self._per_item(factor_cv, self.energy_types, self.energy_codes)
+        codes = self.codes[used]
+        
+        emissions = np.empty((samples, len(self.paths)))
+        for start in range(0, samples, chunk_size):
+            count = min(chunk_size, samples - start)
+            quantity = base * _lognormal(rng, (count, len(used)), node_cv)
+            factors = self.factors * _lognormal(rng, (count, len(self.factors)), type_cv)
+            emissions[start:start + count] = (quantity * factors[:, codes]) @ incidence
+        return emissions
+    
+    def uncertainty(self, top_n=5, samples=10000, quantity_cv=0.1, factor_cv=0.05, seed=0):
+        """
+        Ranking con incertidumbre: distribución de emisiones de cada camino
+        
+        Ordena por emisiones medias e informa, además del valor puntual, los
+        percentiles 5 y 95 y la probabilidad de que el camino sea el de
+        menores emisiones.
+        """
+        if not len(self.paths) or not samples:
+            return []
+        emissions = self.sample_path_emissions(samples, quantity_cv, factor_cv, seed)
+        mean = emissions.mean(axis=0)
+        p5, p95 = np.percentile(emissions, [5, 95], axis=0)
+        best = np.bincount(emissions.argmin(axis=1), minlength=len(self.paths)) / samples
+        point = self._aggregate(np.asarray(self.data.node_weights, dtype=float))
+        
+        ranking = []
+        for i in np.lexsort((self.hops, mean))[:top_n].tolist():
+            ranking.append({
+                'path': [self.data.node_names[node_id] for node_id in self.paths[i]],
+                'total_emissions': float(point[i]),
+                'nodes': int(self.hops[i]),
+                'mean_emissions': float(mean[i]),
+                'p5_emissions': float(p5[i]),
+                'p95_emissions': float(p95[i]),
+                'best_probability': float(best[i])
+            })
+        return ranking
@@ -1,120 +1,1243 @@
 import model
-import gui
-import pandas as pd
-from PySide6.QtWidgets import QFileDialog
+import storage
+import factors
+import numpy as np
 import os
+import heapq
+import hashlib
+import json
+import csv
+import pickle
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 from datetime import datetime
 
-class Data:
-    def __init__(self, graph):
-        self.emissions_table = {
-            "Electricidad (kWh)": 0.429, "Gasolina (L)": 2.26, 
-            "Diesel (L)": 2.69, "Bunker (L)": 3.01,
-            "Queroseno (L)": 2.48, "LPG (L)": 1.61, 
-            "Gasolina de aviacion (L)": 2.69, "Jet Fuel (L)": 2.46
+# Tabla del conjunto de factores por defecto (ver factors.py)
+EMISSIONS_TABLE = factors.DEFAULT_FACTORS
+
+# Presupuesto de la búsqueda acotada: expansiones por camino pedido y por nodo
+# (como mínimo BOUNDED_MIN_BUDGET); al agotarse el top-k se completa con Yen
+BOUNDED_BUDGET_FACTOR = 10
+BOUNDED_MIN_BUDGET = 10000
+
+# Aristas que el DFS de enumeración puede recorrer por camino pedido antes de
+# rendirse (ciclos sin salida hacen exponencial el recorrido)
+ENUMERATION_STEP_FACTOR = 100
+
+def node_emissions(node, factor_set=None):
+    """
+    Emisiones aportadas por un nodo (los nodos especiales no emiten)
+    
+    Usa los códigos del conjunto de factores, igual que Data: un tipo de
+    energía sin factor emite 0 y Data.unknown_energy_types lo informa.
+    """
+    factor_set = factor_set or factors.default_set()
+    codes = factor_set.encode([node.get('energy_type', 'N/A')])
+    weights = factor_set.node_weights(codes, [node.get('quantity', 0.0)], [node['type'] == 'normal'])
+    return float(weights[0])
+
+def _iter_simple_paths(offsets, targets, weights, prefix, end, budget=None):
+    """
+    DFS iterativo sobre CSR desde un prefijo: genera (camino de ids, emisiones) hasta end
+    
+    Con budget, tras recorrer esa cantidad de aristas genera None y termina.
+    """
+    path = list(prefix)
+    on_path = [False] * (len(offsets) - 1)
+    total = 0
+    for node_id in path:
+        on_path[node_id] = True
+        total += weights[node_id]
+    if path[-1] == end:
+        yield tuple(path), total
+        return
+    
+    # Emisiones acumuladas hasta cada nivel de la pila
+    emissions = [total]
+    last = path[-1]
+    stack = [iter(targets[offsets[last]:offsets[last + 1]])]
+    steps = 0
+    while stack:
+        neighbor = next(stack[-1], None)
+        if neighbor is None:
+            stack.pop()
+            on_path[path.pop()] = False
+            emissions.pop()
+            continue
+        steps += 1
+        if budget is not None and steps > budget:
+            yield None
+            return
+        if on_path[neighbor]:
+            continue
+        
+        total = emissions[-1] + weights[neighbor]
+        if neighbor == end:
+            yield tuple(path) + (end,), total
+            continue
+        
+        path.append(neighbor)
+        on_path[neighbor] = True
+        emissions.append(total)
+        stack.append(iter(targets[offsets[neighbor]:offsets[neighbor + 1]]))
+
+def _reachable(offsets, targets, source, count):
+    """BFS sobre CSR: mascara de los nodos alcanzables desde source"""
+    seen = np.zeros(count, dtype=bool)
+    seen[source] = True
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for node_id in frontier:
+            for neighbor in targets[offsets[node_id]:offsets[node_id + 1]]:
+                if not seen[neighbor]:
+                    seen[neighbor] = True
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    return seen
+
+# Grafo compacto de cada proceso del pool, enviado una sola vez por _init_worker
+_worker_offsets = None
+_worker_targets = None
+_worker_weights = None
+
+def _init_worker(offsets, targets, weights):
+    """Inicializa un proceso del pool con el grafo en arreglos CSR"""
+    global _worker_offsets, _worker_targets, _worker_weights
+    _worker_offsets = memoryview(offsets)
+    _worker_targets = memoryview(targets)
+    _worker_weights = weights.tolist()
+
+def _rank_subtree(prefix, end, top_n):
+    """Enumera los caminos que empiezan con prefix y devuelve su ranking parcial"""
+    results = ((emissions, len(path) - 2, path) for path, emissions
+               in _iter_simple_paths(_worker_offsets, _worker_targets, _worker_weights, prefix, end)
+               if len(path) > 2)
+    if top_n is None:
+        return sorted(results, key=lambda x: (x[0], x[1]))
+    return heapq.nsmallest(top_n, results, key=lambda x: (x[0], x[1]))
+
+def _slack(cost):
+    """Holgura relativa para comparar sumas de flotantes hechas en distinto orden"""
+    return 1e-9 * max(1.0, abs(cost))
+
+def _read_run(file):
+    """Lee de a uno los registros de un tramo ordenado guardado con pickle"""
+    file.seek(0)
+    while True:
+        try:
+            yield pickle.load(file)
+        except EOFError:
+            return
+
+def ranking_rows(ranked_paths):
+    """Genera las filas de exportación (columnas de la hoja de resultados) de un ranking"""
+    for i, path in enumerate(ranked_paths):
+        row = {
+            'Ranking': i+1,
+            'Ruta': " → ".join(path['path']),
+            'Emisiones Totales (ton CO2)': round(path['total_emissions'], 2),
+            'Nodos Intermedios': path['nodes']
         }
-        self.graph = graph
-        self.adjacency_list = self._build_adjacency_list()
-        self.all_paths = []
-        
-    def _build_adjacency_list(self):
-        """Construye lista de adyacencia para el grafo"""
-        adjacency = {}
-        for edge in self.graph['edges']:
-            if edge['source'] not in adjacency:
-                adjacency[edge['source']] = []
-            adjacency[edge['source']].append(edge['target'])
-        return adjacency
-    
-    def _find_all_paths(self, current, end, path, visited):
-        """Algoritmo DFS recursivo para encontrar todos los caminos"""
-        path.append(current)
-        visited.add(current)
-        
-        if current == end:
-            self.all_paths.append(list(path))
+        # Columnas opcionales (frente de Pareto y ranking difuso)
+        if 'total_investment' in path:
+            row['Inversion Total (USD)'] = round(path['total_investment'], 2)
+        if 'score' in path:
+            row['Evaluacion'] = round(path['score'], 4)
+        # Ranking con incertidumbre (analysis.ScenarioSweep.uncertainty)
+        if 'mean_emissions' in path:
+            row['Emisiones Media'] = round(path['mean_emissions'], 2)
+            row['Emisiones P5'] = round(path['p5_emissions'], 2)
+            row['Emisiones P95'] = round(path['p95_emissions'], 2)
+            row['Prob. Mejor'] = round(path['best_probability'], 4)
+        yield row
+
+BASE_COLUMNS = ['Ranking', 'Ruta', 'Emisiones Totales (ton CO2)', 'Nodos Intermedios']
+
+# Ancho de columnas de la hoja de resultados
+COLUMN_WIDTHS = {
+    'A': 10,  # Ranking
+    'B': 50,  # Ruta
+    'C': 20,  # Emisiones
+    'D': 15,  # Nodos
+    'E': 20,  # Inversion / Evaluacion / Media
+    'F': 15,  # Evaluacion / P5
+    'G': 15,  # P95
+    'H': 15   # Prob. Mejor
+}
+
+def _first_row(ranked_paths):
+    """Separa la primera fila (define las columnas) del resto del generador"""
+    rows = ranking_rows(ranked_paths)
+    first = next(rows, None)
+    columns = list(first) if first is not None else BASE_COLUMNS
+    return columns, first, rows
+
+def export_to_excel(ranked_paths, filename):
+    """
+    Exporta los resultados a un archivo Excel
+    
+    Escribe fila por fila en modo write-only de openpyxl: la exportación no
+    guarda las filas, así que la memoria es la del origen de ranked_paths.
+    Data.iter_ranked_paths crece con los caminos generados; para exportar
+    todos los caminos de una auditoría usar Data.iter_all_ranked_paths, de
+    memoria acotada.
+    """
+    try:
+        # openpyxl se importa aquí para no cargarlo en usos sin exportación
+        from openpyxl import Workbook
+        
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Resultados')
+        
+        # En modo write-only los anchos se fijan antes de escribir filas
+        for col, width in COLUMN_WIDTHS.items():
+            worksheet.column_dimensions[col].width = width
+        
+        columns, first, rows = _first_row(ranked_paths)
+        worksheet.append(columns)
+        if first is not None:
+            worksheet.append([first.get(column) for column in columns])
+        for row in rows:
+            worksheet.append([row.get(column) for column in columns])
+        
+        workbook.save(filename)
+        return True
+    except Exception as e:
+        print(f"Error al exportar a Excel: {str(e)}")
+        return False
+
+def export_to_csv(ranked_paths, filename):
+    """Exporta los resultados a CSV, fila por fila (acepta generadores)"""
+    try:
+        columns, first, rows = _first_row(ranked_paths)
+        with open(filename, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            if first is not None:
+                writer.writerow(first)
+            writer.writerows(rows)
+        return True
+    except Exception as e:
+        print(f"Error al exportar a CSV: {str(e)}")
+        return False
+
+def ranking_key(graph, emissions_table=EMISSIONS_TABLE, **params):
+    """Hash canónico del contenido del grafo, la tabla de factores y los parámetros del ranking"""
+    # Sólo entran los campos que afectan al ranking (no posiciones ni descripciones)
+    nodes = sorted([
+        node['name'], node['type'], node.get('energy_type', 'N/A'), node.get('quantity', 0.0),
+        list(node.get('co2_limits', (0.0, 0.0))), list(node.get('inv_limits', (0.0, 0.0))),
+        node.get('inversion', 0.0)
+    ] for node in graph['nodes'])
+    edges = sorted([edge['source'], edge['target']] for edge in graph['edges'])
+    content = json.dumps({
+        'nodes': nodes,
+        'edges': edges,
+        'emissions_table': emissions_table,
+        'params': params
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class RankingCache:
+    """
+    Caché LRU de rankings por hash de contenido (ver ranking_key)
+    
+    Con directory, cada ranking también se guarda como JSON en disco y se
+    recupera en sesiones siguientes; la memoria se consulta primero.
+    """
+    def __init__(self, max_entries=64, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+    
+    def _filename(self, key):
+        """Archivo del ranking en el directorio de la caché"""
+        return os.path.join(self.directory, f"{key}.json")
+    
+    def _remember(self, key, ranking):
+        """Guarda en memoria, descartando el ranking usado hace más tiempo"""
+        self._entries[key] = ranking
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def get(self, key):
+        """Devuelve una copia del ranking guardado, o None si no está"""
+        ranking = self._entries.get(key)
+        if ranking is not None:
+            self._entries.move_to_end(key)
+        elif self.directory is not None:
+            try:
+                with open(self._filename(key), encoding="utf-8") as f:
+                    ranking = json.load(f)
+            except (OSError, ValueError):
+                ranking = None
+            else:
+                self._remember(key, ranking)
+        if ranking is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [dict(entry) for entry in ranking]
+    
+    def put(self, key, ranking):
+        """Guarda un ranking en memoria y, si hay directorio, en disco"""
+        self._remember(key, [dict(entry) for entry in ranking])
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = self._filename(key) + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(ranking, f, ensure_ascii=False)
+            os.replace(temporary, self._filename(key))
+        except OSError as e:
+            print(f"No se pudo guardar el ranking en caché: {str(e)}")
+    
+    def clear(self):
+        """Vacía la caché en memoria (los archivos en disco se conservan)"""
+        self._entries.clear()
+
+# Caché compartida por la interfaz gráfica
+RANKING_CACHE = RankingCache()
+
+def cached_ranking(graph, top_n=5, mode="emissions", cache=None, factor_set=None, **options):
+    """Ranking de un grafo en diccionario; si el contenido no cambió, lo toma de la caché"""
+    cache = RANKING_CACHE if cache is None else cache
+    factor_set = factor_set or factors.default_set()
+    key = ranking_key(graph, factor_set.factors, top_n=top_n, mode=mode, **options)
+    ranking = cache.get(key)
+    if ranking is None:
+        data_processor = Data(graph, factor_set)
+        if mode == "pareto":
+            ranking = data_processor.get_pareto_front(top_n)
         else:
-            for neighbor in self.adjacency_list.get(current, []):
-                if neighbor not in visited:
-                    self._find_all_paths(neighbor, end, path, visited)
+            ranking = data_processor.get_ranking(top_n, mode, **options)
+        cache.put(key, ranking)
+    return ranking
+
+class Data:
+    def __init__(self, graph, factor_set=None):
+        self.factor_set = factor_set or factors.default_set()
+        self.emissions_table = dict(self.factor_set.factors)
+        self.graph = graph
+        self._build_node_index()
+        self._check_non_negative()
+        self._build_csr()
+        self._prune_unreachable()
+        self._reset_search_state()
+    
+    @classmethod
+    def from_arrays(cls, arrays, factor_set=None):
+        """
+        Construye Data desde arreglos columnares (ver storage.load_arrays)
+        
+        No arma el diccionario de nodos: self.graph queda en None (usar
+        storage.arrays_to_graph si hace falta).
+        """
+        data = cls.__new__(cls)
+        data.factor_set = factor_set or factors.default_set()
+        data.emissions_table = dict(data.factor_set.factors)
+        data.graph = None
+        data._index_arrays(arrays)
+        data._check_non_negative()
+        data._reset_search_state()
+        return data
+    
+    def _reset_search_state(self):
+        """Seguimiento de busquedas largas (por ejemplo desde un hilo de la GUI)"""
+        self.paths_explored = 0
+        self.last_search_stats = None
+        self.progress_callback = None
+        self.cancelled = False
+    
+    def _index_arrays(self, arrays):
+        """Construye el indice de nodos y la adyacencia a partir de arreglos columnares"""
+        self.node_names = storage.unpack_strings(arrays['name_offsets'], arrays['name_bytes'])
+        self.node_ids = {name: i for i, name in enumerate(self.node_names)}
+        
+        normal = arrays['node_type'] == storage.NODE_NORMAL
+        # Códigos locales del archivo -> códigos del conjunto de factores (-1 queda en -1)
+        file_types = arrays['energy_types']
+        codes = np.append(self.factor_set.encode(file_types), factors.UNKNOWN_CODE)[arrays['energy_code']]
+        self._apply_factors(normal, codes, arrays['quantity'],
+                            lambda i: file_types[arrays['energy_code'][i]])
+        self.node_investments = np.where(normal, arrays['inversion'], 0).tolist()
+        # Los límites sólo se usan en score_paths, que los trata como arreglos
+        self.node_co2_limits = np.where(normal[:, None], arrays['co2_limits'], 0)
+        self.node_inv_limits = np.where(normal[:, None], arrays['inv_limits'], 0)
+        
+        self.special_ids = {self.node_names[i]: i for i in np.flatnonzero(~normal).tolist()}
+        self.start_id = self.special_ids.get('starter')
+        self.end_id = self.special_ids.get('end')
+        
+        self._set_csr(arrays['edge_offsets'].astype(np.int32), np.asarray(arrays['edge_targets'], dtype=np.int32))
+        self._prune_unreachable()
+    
+    def _apply_factors(self, normal, codes, quantities, energy_type_of):
+        """Calcula las emisiones de todos los nodos y registra los tipos de energía sin factor"""
+        self.node_weights = self.factor_set.node_weights(codes, quantities, normal).tolist()
+        
+        # Los nodos con tipos desconocidos emiten 0, pero quedan informados
+        self.unknown_energy_types = {}
+        for i in np.flatnonzero(normal & (codes == factors.UNKNOWN_CODE)).tolist():
+            self.unknown_energy_types.setdefault(energy_type_of(i), []).append(self.node_names[i])
+    
+    def _check_non_negative(self):
+        """
+        Rechaza nodos con emisiones o inversión negativas
+        
+        Dijkstra, la búsqueda acotada y el frente de Pareto suponen pesos no
+        negativos: con un ciclo de costo negativo no terminarían.
+        """
+        for label, values in (("emisiones negativas", self.node_weights),
+                              ("inversión negativa", self.node_investments)):
+            negative = np.flatnonzero(np.asarray(values, dtype=float) < 0).tolist()
+            if negative:
+                names = ", ".join(self.node_names[i] for i in negative)
+                raise ValueError(f"Nodos con {label}: {names}")
+    
+    def _build_node_index(self):
+        """Construye el indice de nodos: nombre -> id, pesos y nodos especiales"""
+        self.node_names = []
+        self.node_ids = {}
+        self.node_investments = []
+        self.node_co2_limits = []
+        self.node_inv_limits = []
+        self.special_ids = {}
+        for node in self.graph['nodes']:
+            node_id = len(self.node_names)
+            self.node_names.append(node['name'])
+            self.node_ids[node['name']] = node_id
+            investment = 0
+            co2_limits = inv_limits = (0, 0)
+            if node['type'] == 'normal':
+                investment = node.get('inversion', 0)
+                co2_limits = tuple(node.get('co2_limits', co2_limits))
+                inv_limits = tuple(node.get('inv_limits', inv_limits))
+            else:
+                self.special_ids[node['name']] = node_id
+            self.node_investments.append(investment)
+            self.node_co2_limits.append(co2_limits)
+            self.node_inv_limits.append(inv_limits)
+        self.start_id = self.special_ids.get('starter')
+        self.end_id = self.special_ids.get('end')
+        
+        nodes = self.graph['nodes']
+        normal = np.array([node['type'] == 'normal' for node in nodes], dtype=bool)
+        energy_types = [node.get('energy_type', 'N/A') for node in nodes]
+        quantities = np.array([node.get('quantity', 0.0) for node in nodes], dtype=float)
+        self._apply_factors(normal, self.factor_set.encode(energy_types), quantities,
+                            energy_types.__getitem__)
+    
+    def _build_csr(self):
+        """Convierte las aristas a CSR: offsets por nodo origen y destinos (int32)"""
+        node_ids = self.node_ids
+        edges = self.graph['edges']
+        sources = np.fromiter((node_ids[edge['source']] for edge in edges), dtype=np.int32, count=len(edges))
+        targets = np.fromiter((node_ids[edge['target']] for edge in edges), dtype=np.int32, count=len(edges))
         
-        path.pop()
-        visited.remove(current)
+        # Orden estable: cada nodo conserva el orden original de sus aristas
+        order = np.argsort(sources, kind='stable')
+        offsets = np.zeros(len(self.node_names) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources, minlength=len(self.node_names)), out=offsets[1:])
+        self._set_csr(offsets, targets[order])
+    
+    def _set_csr(self, offsets, targets):
+        """Guarda los arreglos CSR y sus vistas para recorrerlos desde Python"""
+        self.adj_offsets = offsets
+        self.adj_targets = targets
+        # Las memoryview devuelven int de Python sin pasar por escalares de NumPy
+        self._offsets = memoryview(offsets)
+        self._targets = memoryview(targets)
+    
+    def _edge_sources(self):
+        """Nodo origen de cada arista del CSR"""
+        count = len(self.adj_offsets) - 1
+        return np.repeat(np.arange(count, dtype=np.int32), np.diff(self.adj_offsets))
+    
+    def _reverse_csr(self):
+        """CSR de aristas entrantes: offsets por nodo destino y origenes"""
+        count = len(self.adj_offsets) - 1
+        order = np.argsort(self.adj_targets, kind='stable')
+        offsets = np.zeros(count + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.adj_targets, minlength=count), out=offsets[1:])
+        return offsets, self._edge_sources()[order]
+    
+    def _prune_unreachable(self):
+        """
+        Restringe la búsqueda a los nodos alcanzables desde starter que llegan a end
+        
+        Un BFS hacia adelante desde starter y otro sobre las aristas invertidas
+        desde end marcan los nodos que pueden estar en algún camino; el resto
+        queda en disconnected_nodes y sus aristas se quitan del CSR.
+        """
+        count = len(self.node_names)
+        self.relevant = np.ones(count, dtype=bool)
+        self.disconnected_nodes = []
+        if self.start_id is None or self.end_id is None:
+            return
+        
+        rev_offsets, rev_targets = self._reverse_csr()
+        forward = _reachable(self._offsets, self._targets, self.start_id, count)
+        backward = _reachable(memoryview(rev_offsets), memoryview(rev_targets), self.end_id, count)
+        self.relevant = forward & backward
+        self.disconnected_nodes = [self.node_names[i] for i in np.flatnonzero(~self.relevant).tolist()]
+        if not self.disconnected_nodes:
+            return
+        
+        sources = self._edge_sources()
+        keep = self.relevant[sources] & self.relevant[self.adj_targets]
+        offsets = np.zeros(count + 1, dtype=np.int32)
+        np.cumsum(np.bincount(sources[keep], minlength=count), out=offsets[1:])
+        self._set_csr(offsets, self.adj_targets[keep])
+    
+    def neighbors(self, node_id):
+        """Sucesores de un nodo (vista sobre los destinos CSR)"""
+        return self._targets[self._offsets[node_id]:self._offsets[node_id + 1]]
+    
+    def _special_nodes(self):
+        """Devuelve los ids de los nodos starter y end"""
+        if self.start_id is None or self.end_id is None:
+            raise ValueError("El grafo debe contener los nodos 'starter' y 'end'")
+        return self.start_id, self.end_id
+    
+    def _find_all_paths(self, start, end):
+        """DFS iterativo: genera (camino de ids, emisiones) para cada camino simple"""
+        return _iter_simple_paths(self._offsets, self._targets, self.node_weights, [start], end)
     
     def _calculate_emissions(self, path):
         """Calcula las emisiones totales para un camino"""
         total = 0
         for node_name in path:
-            node = next(n for n in self.graph['nodes'] if n['name'] == node_name)
-            if node['type'] == 'normal':
-                energy_type = node['energy_type']
-                quantity = node['quantity']
-                emission_factor = self.emissions_table.get(energy_type, 0)
-                total += quantity * emission_factor
+            total += self.node_weights[self.node_ids[node_name]]
         return total
     
-    def process_graph(self):
-        """Procesa el grafo y calcula todos los caminos válidos"""
-        start_node = next(n['name'] for n in self.graph['nodes'] if n['type'] == 'special' and n['name'] == 'starter')
-        end_node = next(n['name'] for n in self.graph['nodes'] if n['type'] == 'special' and n['name'] == 'end')
-        
-        self._find_all_paths(start_node, end_node, [], set())
+    def _compact_graph(self):
+        """Grafo en arreglos compactos (offsets, destinos, pesos) para los procesos"""
+        return self.adj_offsets, self.adj_targets, np.asarray(self.node_weights, dtype=float)
+    
+    def _split_frontier(self, start, end, min_tasks):
+        """Expande prefijos desde start (en orden DFS) hasta tener min_tasks subárboles"""
+        tasks = [[start]]
+        while len(tasks) < min_tasks:
+            expanded = []
+            grew = False
+            for prefix in tasks:
+                if prefix[-1] == end:
+                    expanded.append(prefix)
+                    continue
+                for neighbor in self.neighbors(prefix[-1]):
+                    if neighbor not in prefix:
+                        expanded.append(prefix + [neighbor])
+                        grew = True
+            tasks = expanded
+            if not grew:
+                break
+        return tasks
+    
+    def _process_graph_parallel(self, start, end, top_n, workers):
+        """Enumeración completa repartida por subárboles en un ProcessPoolExecutor"""
+        tasks = self._split_frontier(start, end, 4 * workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=self._compact_graph()) as executor:
+            partials = list(executor.map(_rank_subtree, tasks, repeat(end), repeat(top_n)))
         
-        # Filtrar caminos que tengan al menos un nodo intermedio
-        valid_paths = [path for path in self.all_paths if len(path) > 2]
+        # Los rankings parciales ya vienen ordenados: se mezclan con un heap
+        merged = heapq.merge(*partials, key=lambda x: (x[0], x[1]))
+        return [self._rank_entry(path, emissions) for emissions, _, path in islice(merged, top_n)]
+    
+    def process_graph(self, top_n=None, workers=None):
+        """Procesa el grafo y calcula todos los caminos válidos (en paralelo si workers > 1)"""
+        start_id, end_id = self._special_nodes()
+        if workers is not None and workers > 1:
+            return self._process_graph_parallel(start_id, end_id, top_n, workers)
         
-        # Calcular emisiones para cada camino
         ranked_paths = []
-        for path in valid_paths:
-            emissions = self._calculate_emissions(path)
-            ranked_paths.append({
-                'path': path,
-                'total_emissions': emissions,
-                'nodes': len(path) - 2  # Nodos intermedios
-            })
+        for path, emissions in self._find_all_paths(start_id, end_id):
+            # Filtrar caminos que tengan al menos un nodo intermedio
+            if len(path) > 2:
+                ranked_paths.append(self._rank_entry(path, emissions))
         
         # Ordenar por emisiones y luego por cantidad de nodos
         ranked_paths.sort(key=lambda x: (x['total_emissions'], x['nodes']))
-        return ranked_paths
+        return ranked_paths[:top_n]
     
-    def get_ranking(self, top_n=5):
-        """Devuelve el ranking formateado"""
-        ranked = self.process_graph()
-        return ranked[:top_n]
+    def _shortest_path(self, source, target, weights, banned_nodes, banned_edges):
+        """Dijkstra sobre pesos de nodo con desempate por cantidad de nodos"""
+        offsets, targets = self._offsets, self._targets
+        best = {source: (0, 0)}
+        parent = {source: None}
+        heap = [(0, 0, source)]
+        while heap:
+            emissions, hops, current = heapq.heappop(heap)
+            if (emissions, hops) > best[current]:
+                continue
+            if current == target:
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = parent[current]
+                return path[::-1]
+            for neighbor in targets[offsets[current]:offsets[current + 1]]:
+                if neighbor in banned_nodes or (current, neighbor) in banned_edges:
+                    continue
+                cost = (emissions + weights[neighbor], hops + 1)
+                if neighbor not in best or cost < best[neighbor]:
+                    best[neighbor] = cost
+                    parent[neighbor] = current
+                    heapq.heappush(heap, (cost[0], cost[1], neighbor))
+        return None
     
-    def export_to_excel(self, ranked_paths, filename):
-        """Exporta los resultados a un archivo Excel"""
-        try:
-            # Crear DataFrame
-            df = pd.DataFrame([{
-                'Ranking': i+1,
-                'Ruta': " → ".join(path['path']),
-                'Emisiones Totales (ton CO2)': round(path['total_emissions'], 2),
-                'Nodos Intermedios': path['nodes']
-            } for i, path in enumerate(ranked_paths)])
+    def _rank_entry(self, path, emissions=None):
+        """Arma la entrada del ranking para un camino de ids"""
+        if emissions is None:
+            emissions = 0
+            for node_id in path:
+                emissions += self.node_weights[node_id]
+        return {
+            'path': [self.node_names[node_id] for node_id in path],
+            'total_emissions': emissions,
+            'nodes': len(path) - 2  # Nodos intermedios
+        }
+    
+    def _iter_k_shortest_paths(self, start, end, weights):
+        """
+        Caminos de Yen en orden de costo, con el desempate de process_graph
+        
+        Los desvíos salen de Dijkstra, que suma en otro orden que el costo
+        exacto: un camino puede salir antes que otro de igual costo exacto
+        y menos saltos. Los caminos a menos de _slack del anterior se
+        juntan y salen ordenados por (costo, saltos, nombres) cuando llega
+        uno claramente más caro.
+        """
+        names = self.node_names
+        group = []
+        highest = 0
+        for path, cost in self._iter_yen_paths(start, end, weights):
+            if group and cost > highest + _slack(cost):
+                group.sort()
+                for entry in group:
+                    yield entry[3], entry[0]
+                group = []
+            group.append((cost, len(path), [names[node_id] for node_id in path], path))
+            highest = max(highest, cost)
+        group.sort()
+        for entry in group:
+            yield entry[3], entry[0]
+    
+    def _iter_yen_paths(self, start, end, weights):
+        """
+        Algoritmo de Yen: genera (camino de ids, costo) en orden de costo
+        
+        Los caminos aceptados se guardan en un trie (id -> subárbol): las
+        aristas prohibidas para un desvío son los hijos del prefijo común,
+        sin recorrer la lista de aceptados.
+        """
+        # El camino directo starter -> end no tiene nodos intermedios
+        excluded = {(start, end)}
+        
+        first = self._shortest_path(start, end, weights, set(), excluded)
+        if first is None:
+            return
+        
+        accepted = {}
+        candidates = []
+        seen = {tuple(first)}
+        previous = first
+        yield first, self._path_cost(first, weights)
+        while True:
+            branch = accepted
+            for node_id in previous:
+                branch = branch.setdefault(node_id, {})
             
-            # Configurar el escritor de Excel
-            writer = pd.ExcelWriter(filename, engine='openpyxl')
-            df.to_excel(writer, index=False, sheet_name='Resultados')
+            branch = accepted
+            for i in range(len(previous) - 1):
+                spur_node = previous[i]
+                root = previous[:i + 1]
+                
+                branch = branch[spur_node]
+                banned_edges = set(excluded)
+                banned_edges.update((spur_node, next_id) for next_id in branch)
+                banned_nodes = set(root[:-1])
+                
+                spur_path = self._shortest_path(spur_node, end, weights, banned_nodes, banned_edges)
+                self.paths_explored += 1
+                if self.progress_callback:
+                    self.progress_callback(self.paths_explored)
+                if self.cancelled:
+                    return
+                if spur_path is None:
+                    continue
+                path = root[:-1] + spur_path
+                if tuple(path) in seen:
+                    continue
+                seen.add(tuple(path))
+                names = [self.node_names[node_id] for node_id in path]
+                heapq.heappush(candidates, (self._path_cost(path, weights), len(path), names, path))
             
-            # Formatear la hoja
-            workbook = writer.book
-            worksheet = writer.sheets['Resultados']
+            if not candidates:
+                return
+            cost, _, _, path = heapq.heappop(candidates)
+            previous = path
+            yield path, cost
+    
+    def _path_cost(self, path, weights):
+        """Suma los pesos de nodo a lo largo de un camino de ids"""
+        total = 0
+        for node_id in path:
+            total += weights[node_id]
+        return total
+    
+    def iter_ranked_paths(self, top_n=None, method="bounded"):
+        """
+        Genera los caminos de a uno, en orden ascendente de emisiones
+        
+        Con top_n usa la búsqueda acotada (_iter_bounded_paths), que poda con
+        el k-ésimo mejor costo y deja sus contadores en last_search_stats. No
+        tiene cota polinomial (en grafos con ciclos puede expandir cada
+        parcial sin salida), así que corre con un presupuesto de expansiones
+        y, si se agota, completa el top-k con Yen. Sin top_n, o con
+        method="yen", usa Yen: sin cota no hay poda y la búsqueda acotada
+        guardaría todos los caminos parciales.
+        
+        No arma la lista de todos los caminos, pero la memoria crece con los
+        ya generados: Yen guarda los k caminos aceptados (trie) y sus
+        candidatos, O(k·L) para caminos de largo L.
+        """
+        if method not in ("bounded", "yen"):
+            raise ValueError(f"Método de búsqueda no válido: {method}")
+        start_id, end_id = self._special_nodes()
+        if top_n is not None and method == "bounded":
+            paths = self._iter_top_paths(start_id, end_id, top_n)
+        else:
+            paths = islice(self._iter_k_shortest_paths(start_id, end_id, self.node_weights), top_n)
+        return (self._rank_entry(path, emissions) for path, emissions in paths)
+    
+    def _iter_top_paths(self, start, end, top_n):
+        """Búsqueda acotada con presupuesto; si se agota, Yen completa el top-k"""
+        budget = max(BOUNDED_MIN_BUDGET, BOUNDED_BUDGET_FACTOR * top_n * len(self.node_names))
+        yielded = set()
+        for path, cost in self._iter_bounded_paths(start, end, self.node_weights, top_n, budget):
+            yielded.add(tuple(path))
+            yield path, cost
+        if self.cancelled or not self.last_search_stats['exhausted']:
+            return
+        
+        # Yen vuelve a generar los caminos ya entregados: se saltean
+        for path, cost in self._iter_k_shortest_paths(start, end, self.node_weights):
+            if len(yielded) >= top_n:
+                return
+            if tuple(path) in yielded:
+                continue
+            yielded.add(tuple(path))
+            yield path, cost
+    
+    def iter_all_ranked_paths(self, chunk_size=100000):
+        """
+        Todos los caminos en orden de ranking, con memoria acotada (auditorías)
+        
+        Ordenamiento externo: el DFS enumera los caminos, cada tramo de
+        chunk_size se ordena en memoria y se guarda en un archivo temporal, y
+        los tramos se mezclan con heapq.merge. La memoria es la de un tramo
+        más un registro por archivo. Mismo orden que get_ranking.
+        """
+        start_id, end_id = self._special_nodes()
+        names = self.node_names
+        paths = ((emissions, len(path) - 2, tuple(names[node_id] for node_id in path))
+                 for path, emissions in self._find_all_paths(start_id, end_id) if len(path) > 2)
+        runs = []
+        try:
+            while True:
+                chunk = sorted(islice(paths, chunk_size))
+                if not chunk:
+                    break
+                run = tempfile.TemporaryFile()
+                runs.append(run)
+                for record in chunk:
+                    pickle.dump(record, run, pickle.HIGHEST_PROTOCOL)
+                del chunk
             
-            # Ajustar ancho de columnas
-            column_widths = {
-                'A': 10,  # Ranking
-                'B': 50,  # Ruta
-                'C': 20,  # Emisiones
-                'D': 15   # Nodos
-            }
+            for emissions, hops, path in heapq.merge(*(_read_run(run) for run in runs)):
+                yield {'path': list(path), 'total_emissions': emissions, 'nodes': hops}
+        finally:
+            for run in runs:
+                run.close()
+    
+    def _remaining_costs(self, end, weights):
+        """Dijkstra inverso desde end: (emisiones, saltos) mínimos que faltan desde cada nodo"""
+        rev_offsets, rev_targets = self._reverse_csr()
+        offsets, sources = memoryview(rev_offsets), memoryview(rev_targets)
+        remaining = [(float('inf'), 0)] * len(self.node_names)
+        remaining[end] = (0, 0)
+        heap = [(0, 0, end)]
+        while heap:
+            emissions, hops, current = heapq.heappop(heap)
+            if (emissions, hops) > remaining[current]:
+                continue
+            cost = (emissions + weights[current], hops + 1)
+            for previous in sources[offsets[current]:offsets[current + 1]]:
+                if cost < remaining[previous]:
+                    remaining[previous] = cost
+                    heapq.heappush(heap, (cost[0], cost[1], previous))
+        return remaining
+    
+    def _iter_bounded_paths(self, start, end, weights, top_n, budget=None):
+        """
+        Búsqueda best-first (estilo A*) de los top_n caminos de menor costo
+        
+        Los caminos parciales se ordenan por costo acumulado más la cota
+        inferior de lo que falta hasta end (Dijkstra inverso). La cota suma en
+        otro orden que el costo exacto y puede diferir en el último bit, así
+        que los caminos completos esperan en un heap propio, ordenados por
+        costo exacto con el mismo desempate que Yen, hasta que ningún parcial
+        pueda empatarlos (holgura relativa _slack). Con pesos no negativos, un
+        parcial cuya cota supera al k-ésimo mejor camino completo ya
+        encontrado se descarta (top_n=None no poda). Los contadores quedan en
+        last_search_stats: parciales expandidos, generados, podados por la
+        cota y pendientes al completar el top-k. Con budget, la búsqueda se
+        detiene tras esa cantidad de expansiones y marca 'exhausted' en
+        last_search_stats.
+        """
+        remaining = self._remaining_costs(end, weights)
+        stats = {'expanded': 0, 'generated': 1, 'pruned': 0, 'pending': 0, 'exhausted': False}
+        self.last_search_stats = stats
+        names = self.node_names
+        found = 0
+        if top_n == 0:
+            return
+        
+        # Emisiones de los mejores caminos completos encontrados (max-heap negado)
+        best = []
+        bound = float('inf')
+        
+        cost = weights[start]
+        heap = [(cost + remaining[start][0], 1 + remaining[start][1], (names[start],), (start,), cost)]
+        ready = []
+        while heap or ready:
+            if ready and (not heap or ready[0][0] < heap[0][0] - _slack(heap[0][0])):
+                cost, _, _, path = heapq.heappop(ready)
+                yield list(path), cost
+                found += 1
+                if found == top_n:
+                    # Lo que queda en los heaps no puede mejorar el top-k
+                    stats['pending'] = len(heap) + len(ready)
+                    return
+                continue
             
-            for col, width in column_widths.items():
-                worksheet.column_dimensions[col].width = width
-                
-            # Guardar y cerrar
-            writer.close()
-            return True
-        except Exception as e:
-            print(f"Error al exportar a Excel: {str(e)}")
+            estimate, _, path_names, path, cost = heapq.heappop(heap)
+            if estimate > bound + _slack(bound):
+                stats['pruned'] += 1
+                continue
+            current = path[-1]
+            if budget is not None and stats['expanded'] >= budget:
+                stats['exhausted'] = True
+                return
+            stats['expanded'] += 1
+            self.paths_explored += 1
+            if self.progress_callback:
+                self.progress_callback(self.paths_explored)
+            if self.cancelled:
+                return
+            for neighbor in self.neighbors(current):
+                # El camino directo starter -> end no tiene nodos intermedios
+                if neighbor in path or (current == start and neighbor == end):
+                    continue
+                left, hops = remaining[neighbor]
+                if left == float('inf'):
+                    # Desde ese nodo no se llega a end
+                    continue
+                new_cost = cost + weights[neighbor]
+                estimate = new_cost + left
+                if estimate > bound + _slack(bound):
+                    stats['pruned'] += 1
+                    continue
+                stats['generated'] += 1
+                if neighbor == end:
+                    if top_n is not None:
+                        # Cota: k-ésimo mejor costo entre los caminos completos generados
+                        heapq.heappush(best, -new_cost)
+                        if len(best) > top_n:
+                            heapq.heappop(best)
+                        if len(best) == top_n:
+                            bound = -best[0]
+                    heapq.heappush(ready, (new_cost, len(path) + 1,
+                                           path_names + (names[neighbor],), path + (neighbor,)))
+                    continue
+                heapq.heappush(heap, (estimate, len(path) + 1 + hops,
+                                      path_names + (names[neighbor],), path + (neighbor,), new_cost))
+    
+    def _enumerate_paths(self, max_paths, max_steps=None):
+        """
+        Todos los caminos con nodos intermedios, o None si son más de max_paths
+        
+        El DFS se corta tras max_steps aristas recorridas (por defecto
+        ENUMERATION_STEP_FACTOR por max_paths) y también devuelve None: con
+        ciclos sin salida recorre exponencialmente muchos caminos parciales
+        aunque los completos sean pocos.
+        """
+        start_id, end_id = self._special_nodes()
+        if max_steps is None:
+            max_steps = ENUMERATION_STEP_FACTOR * max(max_paths, 1)
+        paths = []
+        for found in _iter_simple_paths(self._offsets, self._targets, self.node_weights,
+                                        [start_id], end_id, max_steps):
+            if found is None:
+                return None
+            if len(found[0]) > 2:
+                if len(paths) == max_paths:
+                    return None
+                paths.append(found[0])
+        return paths
+    
+    def _fuzzy_candidates(self, pool_size):
+        """Reune caminos candidatos: los de menores emisiones y los de menor inversion"""
+        start_id, end_id = self._special_nodes()
+        candidates = {}
+        for weights in (self.node_weights, self.node_investments):
+            for path, _ in islice(self._iter_k_shortest_paths(start_id, end_id, weights), pool_size):
+                candidates.setdefault(tuple(path), path)
+        return list(candidates.values())
+    
+    def score_paths(self, paths, t_norm_type="algebraic", carbon_weight=0.5,
+                    cost_weight=0.5, p_value=0.5):
+        """Evalua en lote caminos de ids con el modelo difuso de carbono e inversion"""
+        lengths = np.array([len(path) for path in paths], dtype=np.int64)
+        if not len(lengths):
+            empty = np.zeros(0)
+            return {'emissions': empty, 'investment': empty, 'score': empty}
+        ids = np.fromiter((node_id for path in paths for node_id in path),
+                          dtype=np.int64, count=int(lengths.sum()))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        
+        def aggregate(values):
+            return np.add.reduceat(np.asarray(values, dtype=float)[ids], offsets, axis=0)
+        
+        emissions = aggregate(self.node_weights)
+        investment = aggregate(self.node_investments)
+        co2_limits = aggregate(self.node_co2_limits)
+        inv_limits = aggregate(self.node_inv_limits)
+        
+        score = model.evaluate_carbon_investment_batch(
+            emissions, investment,
+            co2_limits[:, 0], co2_limits[:, 1],
+            inv_limits[:, 0], inv_limits[:, 1],
+            carbon_weight, cost_weight,
+            t_norm_type=t_norm_type, p_value=p_value
+        )
+        return {'emissions': emissions, 'investment': investment, 'score': score}
+    
+    def get_fuzzy_ranking(self, top_n=5, t_norm_type="algebraic", carbon_weight=0.5,
+                          cost_weight=0.5, p_value=0.5, pool_size=50, max_paths=10000):
+        """
+        Ranking multiobjetivo: ordena por evaluacion difusa (mayor es mejor)
+        
+        Si el grafo no tiene más de max_paths caminos se evalúan todos y el
+        ranking es exacto. Si no (o si el DFS agota su presupuesto de pasos,
+        ver _enumerate_paths), sólo se evalúan los pool_size de menores
+        emisiones y los de menor inversion: la evaluación no es monótona en
+        esos totales, así que el ranking es aproximado y cada entrada lleva
+        'approximate' en True. last_search_stats indica cuántos caminos se
+        evaluaron y si la búsqueda fue exhaustiva.
+        """
+        paths = self._enumerate_paths(max_paths)
+        exhaustive = paths is not None
+        if not exhaustive:
+            paths = self._fuzzy_candidates(max(pool_size, top_n or 0))
+        self.last_search_stats = {'evaluated': len(paths), 'exhaustive': exhaustive}
+        scores = self.score_paths(paths, t_norm_type, carbon_weight, cost_weight, p_value)
+        
+        # Límites degenerados dan nan: esos caminos quedan al final
+        score = np.nan_to_num(scores['score'], nan=-np.inf)
+        hops = np.array([len(path) for path in paths])
+        order = np.lexsort((hops, scores['emissions'], -score))
+        
+        ranking = []
+        for i in order[:top_n]:
+            entry = self._rank_entry(paths[i], self._path_cost(paths[i], self.node_weights))
+            entry['total_investment'] = float(scores['investment'][i])
+            entry['score'] = float(scores['score'][i])
+            if not exhaustive:
+                entry['approximate'] = True
+            ranking.append(entry)
+        return ranking
+    
+    def get_ranking(self, top_n=5, mode="emissions", **fuzzy_options):
+        """
+        Devuelve el ranking formateado
+        
+        "emissions" (o "bounded") usa la búsqueda acotada, "yen" el algoritmo
+        de Yen (mismo ranking, sin poda) y "fuzzy" la evaluación difusa.
+        """
+        if mode == "fuzzy":
+            return self.get_fuzzy_ranking(top_n, **fuzzy_options)
+        if mode == "yen":
+            return list(self.iter_ranked_paths(top_n, method="yen"))
+        if mode not in ("emissions", "bounded"):
+            raise ValueError(f"Modo de ranking no válido: {mode}")
+        return list(self.iter_ranked_paths(top_n))
+    
+    def _is_dominated(self, emissions, investment, points):
+        """Indica si (emisiones, inversion) es dominado (o igualado) por algun punto"""
+        for point_emissions, point_investment in points:
+            if point_emissions <= emissions and point_investment <= investment:
+                return True
+        return False
+    
+    def get_pareto_front(self, max_front=20):
+        """
+        Frente de Pareto de caminos starter -> end sobre (emisiones, inversion)
+        
+        Búsqueda multicriterio por etiquetas (label-setting): las etiquetas se
+        expanden en orden lexicográfico y se descartan las dominadas en cada
+        nodo o por el frente ya encontrado. Con pesos no negativos las etiquetas
+        que vuelven a un nodo del camino quedan dominadas, así que los caminos
+        son simples. Devuelve a lo sumo max_front caminos, ordenados por
+        emisiones, con el mismo formato que get_ranking.
+        """
+        start_id, end_id = self._special_nodes()
+        
+        # Etiquetas: nodo, etiqueta padre, emisiones, inversion y saltos
+        label_node = [start_id]
+        label_parent = [-1]
+        label_emissions = [0 + self.node_weights[start_id]]
+        label_investment = [0 + self.node_investments[start_id]]
+        heap = [(label_emissions[0], label_investment[0], 0, 0)]
+        permanent = [[] for _ in self.node_names]
+        front = []
+        
+        while heap and len(front) < max_front:
+            emissions, investment, hops, label = heapq.heappop(heap)
+            current = label_node[label]
+            if self._is_dominated(emissions, investment, permanent[current]):
+                continue
+            permanent[current].append((emissions, investment))
+            if current == end_id:
+                front.append(label)
+                continue
+            
+            for neighbor in self.neighbors(current):
+                # El camino directo starter -> end no tiene nodos intermedios
+                if current == start_id and neighbor == end_id:
+                    continue
+                new_emissions = emissions + self.node_weights[neighbor]
+                new_investment = investment + self.node_investments[neighbor]
+                if (self._is_dominated(new_emissions, new_investment, permanent[neighbor]) or
+                        self._is_dominated(new_emissions, new_investment, permanent[end_id])):
+                    continue
+                label_node.append(neighbor)
+                label_parent.append(label)
+                label_emissions.append(new_emissions)
+                label_investment.append(new_investment)
+                heapq.heappush(heap, (new_emissions, new_investment, hops + 1, len(label_node) - 1))
+        
+        pareto = []
+        for label in front:
+            path = []
+            step = label
+            while step != -1:
+                path.append(label_node[step])
+                step = label_parent[step]
+            entry = self._rank_entry(path[::-1], label_emissions[label])
+            entry['total_investment'] = label_investment[label]
+            pareto.append(entry)
+        return pareto
+    
+    def export_to_excel(self, ranked_paths, filename):
+        """Exporta los resultados a un archivo Excel"""
+        return export_to_excel(ranked_paths, filename)
+
+class RankingEngine:
+    """
+    Motor de análisis persistente para el editor de grafos
+    
+    Recibe los eventos de edición (alta, baja y actualización de nodos y
+    aristas) y mantiene en caché el ranking top-k de emisiones. Cada evento
+    decide si el ranking en caché sigue siendo válido, si alcanza con
+    reordenarlo o si hay que recalcularlo.
+    """
+    def __init__(self, top_n=5, factor_set=None):
+        self.top_n = top_n
+        self.nodes = {}
+        self.edges = {}
+        self.incident = {}  # Nombre -> claves (source, target) de sus aristas
+        self.factor_set = factor_set or factors.default_set()
+        self.recomputations = 0
+        self.revision = 0  # Aumenta con cada evento de edicion
+        self._ranking = None
+    
+    def graph(self):
+        """Devuelve el grafo en el formato de get_graph_representation"""
+        return {"nodes": list(self.nodes.values()), "edges": list(self.edges.values())}
+    
+    def invalidate(self):
+        """Descarta el ranking en caché"""
+        self._ranking = None
+    
+    def clear(self):
+        """Vacía el grafo; la revisión sigue aumentando, así que los cálculos en curso se descartan"""
+        self.nodes.clear()
+        self.edges.clear()
+        self.incident.clear()
+        self.revision += 1
+        self.invalidate()
+    
+    def _is_complete(self):
+        """El ranking en caché contiene todos los caminos del grafo"""
+        return self._ranking is not None and len(self._ranking) < self.top_n
+    
+    def _uses_node(self, name):
+        """Indica si algún camino del ranking en caché pasa por el nodo"""
+        return any(name in entry['path'] for entry in self._ranking)
+    
+    def _uses_edge(self, source, target):
+        """Indica si algún camino del ranking en caché usa la arista"""
+        for entry in self._ranking:
+            path = entry['path']
+            for i in range(len(path) - 1):
+                if path[i] == source and path[i + 1] == target:
+                    return True
+        return False
+    
+    def _lower_bound_through(self, source, target=None):
+        """Cota inferior de emisiones de un camino que pase por un nodo o una arista"""
+        data = Data(self.graph(), self.factor_set)
+        start_id, end_id = data._special_nodes()
+        source_id = data.node_ids[source]
+        target_id = source_id if target is None else data.node_ids[target]
+        excluded = {(start_id, end_id)}
+        
+        head = data._shortest_path(start_id, source_id, data.node_weights, set(), excluded)
+        tail = data._shortest_path(target_id, end_id, data.node_weights, set(), excluded)
+        if head is None or tail is None:
+            return float('inf')
+        bound = (data._path_cost(head, data.node_weights) +
+                 data._path_cost(tail, data.node_weights))
+        if target is None:
+            # El nodo figura en ambos tramos
+            bound -= data.node_weights[source_id]
+        return bound
+    
+    def _cannot_enter(self, source, target=None):
+        """Ningún camino nuevo por el nodo/arista puede entrar al top-k en caché"""
+        if len(self._ranking) < self.top_n:
+            return False
+        try:
+            bound = self._lower_bound_through(source, target)
+        except ValueError:
             return False
+        return bound > self._ranking[-1]['total_emissions']
+    
+    def add_node(self, node_data):
+        """Registra un nodo nuevo (aislado: no cambia el ranking)"""
+        self.revision += 1
+        self.nodes[node_data['name']] = dict(node_data)
+        self.incident.setdefault(node_data['name'], set())
+        if node_data['type'] == 'special':
+            self.invalidate()
+    
+    def remove_node(self, name):
+        """Elimina un nodo y sus aristas"""
+        self.revision += 1
+        for source, target in list(self.incident.get(name, ())):
+            self.remove_edge(source, target)
+        del self.nodes[name]
+        self.incident.pop(name, None)
+        if self._ranking is not None and self._uses_node(name):
+            self.invalidate()
+    
+    def add_edge(self, source, target):
+        """Registra una arista; sólo invalida si puede aparecer un camino mejor"""
+        self.revision += 1
+        self.edges[(source, target)] = {
+            "source": source,
+            "target": target,
+            "direction": "unidirectional"
+        }
+        self.incident.setdefault(source, set()).add((source, target))
+        self.incident.setdefault(target, set()).add((source, target))
+        if self._ranking is not None and not self._cannot_enter(source, target):
+            self.invalidate()
+    
+    def remove_edge(self, source, target):
+        """Elimina una arista; sólo invalida si la usa algún camino en caché"""
+        self.revision += 1
+        self.edges.pop((source, target), None)
+        for name in (source, target):
+            self.incident.get(name, set()).discard((source, target))
+        if self._ranking is not None and self._uses_edge(source, target):
+            self.invalidate()
+    
+    def update_node(self, old_name, node_data):
+        """Actualiza las propiedades de un nodo (incluido un cambio de nombre)"""
+        self.revision += 1
+        new_name = node_data['name']
+        old_weight = node_emissions(self.nodes[old_name], self.factor_set)
+        new_weight = node_emissions(node_data, self.factor_set)
+        
+        if new_name != old_name:
+            del self.nodes[old_name]
+            renamed = set()
+            for key in self.incident.pop(old_name, ()):
+                edge = self.edges.pop(key)
+                source, target = (new_name if name == old_name else name for name in key)
+                edge['source'], edge['target'] = source, target
+                self.edges[(source, target)] = edge
+                for other in set(key) - {old_name}:
+                    self.incident[other].discard(key)
+                    self.incident[other].add((source, target))
+                renamed.add((source, target))
+            self.incident[new_name] = renamed
+            if self._ranking is not None:
+                for entry in self._ranking:
+                    entry['path'] = [new_name if name == old_name else name for name in entry['path']]
+        self.nodes[new_name] = dict(node_data)
+        
+        if self._ranking is None or new_weight == old_weight:
+            return
+        if self._is_complete() or (new_weight > old_weight and not self._uses_node(new_name)):
+            if self._uses_node(new_name):
+                # Ranking completo: basta con recalcular totales y reordenar
+                for entry in self._ranking:
+                    if new_name in entry['path']:
+                        entry['total_emissions'] = self._path_emissions(entry['path'])
+                self._ranking.sort(key=lambda x: (x['total_emissions'], x['nodes'], x['path']))
+            return
+        if new_weight < old_weight and not self._uses_node(new_name) and self._cannot_enter(new_name):
+            return
+        self.invalidate()
+    
+    def _path_emissions(self, path):
+        """Emisiones de un camino de nombres según los nodos registrados"""
+        total = 0
+        for name in path:
+            total += node_emissions(self.nodes[name], self.factor_set)
+        return total
+    
+    def cached_ranking(self, top_n=None):
+        """Devuelve el ranking en caché, o None si hay que recalcularlo"""
+        if top_n is not None and top_n != self.top_n:
+            self.top_n = top_n
+            self.invalidate()
+        if self._ranking is None:
+            return None
+        return [dict(entry) for entry in self._ranking]
+    
+    def store_ranking(self, ranking, revision):
+        """Guarda un ranking calculado fuera del motor si el grafo no cambió entretanto"""
+        if revision == self.revision:
+            self._ranking = [dict(entry) for entry in ranking]
+    
+    def get_ranking(self, top_n=None):
+        """Devuelve el ranking top-k, recalculándolo sólo si la caché no es válida"""
+        ranking = self.cached_ranking(top_n)
+        if ranking is None:
+            self.recomputations += 1
+            ranking = Data(self.graph(), self.factor_set).get_ranking(self.top_n)
+            self.store_ranking(ranking, self.revision)
+        return ranking
@@ -0,0 +1,542 @@
+import math
+import os
+import random
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+import analysis
+import backend
+import factors
+import layout
+
+ENERGY_TYPES = [
+    "Electricidad (kWh)", "Gasolina (L)", "Diesel (L)", "Bunker (L)",
+    "Queroseno (L)", "LPG (L)", "Gasolina de aviacion (L)", "Jet Fuel (L)"
+]
+
+def make_layered_graph(layers, width, fan_out=3, seed=0):
+    """Genera un grafo por capas starter -> capas -> end, como una cadena de suministro"""
+    rng = random.Random(seed)
+    nodes = [
+        {"name": "starter", "type": "special", "energy_type": "N/A", "quantity": 0.0,
+         "co2_limits": [0.0, 0.0], "inv_limits": [0.0, 0.0], "position": (0.0, 0.0)},
+        {"name": "end", "type": "special", "energy_type": "N/A", "quantity": 0.0,
+         "co2_limits": [0.0, 0.0], "inv_limits": [0.0, 0.0], "position": (0.0, 0.0)}
+    ]
+    edges = []
+    previous = ["starter"]
+    for layer in range(layers):
+        current = []
+        for i in range(width):
+            name = f"Instancia {layer}-{i}"
+            nodes.append({
+                "name": name, "type": "normal",
+                "energy_type": rng.choice(ENERGY_TYPES),
+                "quantity": round(rng.uniform(1, 100), 2),
+                "co2_limits": [0.0, 500.0], "inv_limits": [0.0, 1000.0],
+                "position": (float(layer), float(i))
+            })
+            current.append(name)
+        for source in previous:
+            for target in rng.sample(current, min(fan_out, len(current))):
+                edges.append({"source": source, "target": target, "direction": "unidirectional"})
+        previous = current
+    for source in previous:
+        edges.append({"source": source, "target": "end", "direction": "unidirectional"})
+    return {"nodes": nodes, "edges": edges}
+
+def add_dead_ends(graph, branches, depth, seed=0):
+    """Cuelga de nodos al azar arboles binarios que nunca llegan a end"""
+    rng = random.Random(seed)
+    roots = [node['name'] for node in graph['nodes'] if node['type'] == 'normal']
+    for branch in range(branches):
+        level = [rng.choice(roots)]
+        for d in range(depth):
+            current = []
+            for source in level:
+                for child in range(2):
+                    name = f"Rama {branch}-{d}-{len(current)}"
+                    graph['nodes'].append({
+                        "name": name, "type": "normal",
+                        "energy_type": rng.choice(ENERGY_TYPES),
+                        "quantity": round(rng.uniform(1, 100), 2),
+                        "co2_limits": [0.0, 500.0], "inv_limits": [0.0, 1000.0],
+                        "position": (0.0, 0.0)
+                    })
+                    graph['edges'].append({"source": source, "target": name, "direction": "unidirectional"})
+                    current.append(name)
+            level = current
+    return graph
+
+def legacy_calculate_emissions(data, path):
+    """Calculo de emisiones con busqueda lineal por nodo (implementacion previa al indice)"""
+    total = 0
+    for node_name in path:
+        node = next(n for n in data.graph['nodes'] if n['name'] == node_name)
+        if node['type'] == 'normal':
+            emission_factor = data.emissions_table.get(node['energy_type'], 0)
+            total += node['quantity'] * emission_factor
+    return total
+
+def legacy_export_to_excel(ranked_paths, filename):
+    """Exportacion con un DataFrame completo de pandas (implementacion previa al streaming)"""
+    import pandas as pd
+    df = pd.DataFrame(list(backend.ranking_rows(ranked_paths)))
+    writer = pd.ExcelWriter(filename, engine='openpyxl')
+    df.to_excel(writer, index=False, sheet_name='Resultados')
+    for col, width in backend.COLUMN_WIDTHS.items():
+        writer.sheets['Resultados'].column_dimensions[col].width = width
+    writer.close()
+
+def legacy_update_position(arrow):
+    """Geometria de una flecha con trigonometria escalar (implementacion previa al lote)"""
+    from gui import QLineF, QPointF, QPainterPath, QPolygonF
+    line = QLineF(arrow.start_node.center, arrow.end_node.center)
+    angle = math.atan2(line.dy(), line.dx())
+    start_point = arrow.start_node.center + QPointF(math.cos(angle) * arrow.start_node.radius,
+                                                    math.sin(angle) * arrow.start_node.radius)
+    end_point = arrow.end_node.center - QPointF(math.cos(angle) * arrow.end_node.radius,
+                                                math.sin(angle) * arrow.end_node.radius)
+    path = QPainterPath()
+    path.moveTo(start_point)
+    path.lineTo(end_point)
+    path.addPolygon(QPolygonF([
+        end_point,
+        end_point - QPointF(math.cos(angle + math.pi/6) * arrow.arrow_size,
+                            math.sin(angle + math.pi/6) * arrow.arrow_size),
+        end_point - QPointF(math.cos(angle - math.pi/6) * arrow.arrow_size,
+                            math.sin(angle - math.pi/6) * arrow.arrow_size),
+        end_point
+    ]))
+    arrow.setPath(path)
+
+def synthetic_ranking(count, length=12):
+    """Generador de entradas de ranking sinteticas, sin guardarlas en memoria"""
+    for i in range(count):
+        yield {
+            'path': ['starter'] + [f"Instancia {i}-{j}" for j in range(length)] + ['end'],
+            'total_emissions': i * 0.5,
+            'nodes': length
+        }
+
+def timed(function, *args):
+    """Ejecuta una funcion y devuelve (resultado, segundos)"""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def bench_node_index(layers=20, width=60, top_n=200):
+    """Compara el puntaje de caminos con indice de nodos contra la busqueda lineal"""
+    graph = make_layered_graph(layers, width)
+    data, build_time = timed(backend.Data, graph)
+    ranking, ranking_time = timed(data.get_ranking, top_n)
+    paths = [entry['path'] for entry in ranking]
+
+    legacy, legacy_time = timed(lambda: [legacy_calculate_emissions(data, path) for path in paths])
+    indexed, indexed_time = timed(lambda: [data._calculate_emissions(path) for path in paths])
+    assert legacy == indexed
+
+    print(f"Grafo: {len(graph['nodes'])} nodos, {len(graph['edges'])} aristas")
+    print(f"Construccion de Data (indice incluido): {build_time * 1000:.1f} ms")
+    print(f"Ranking top {top_n}: {ranking_time * 1000:.1f} ms")
+    print(f"Puntaje de {len(paths)} caminos, busqueda lineal: {legacy_time * 1000:.1f} ms")
+    print(f"Puntaje de {len(paths)} caminos, indice de nodos: {indexed_time * 1000:.1f} ms")
+    print(f"Aceleracion: {legacy_time / max(indexed_time, 1e-9):.0f}x")
+
+def legacy_adjacency(graph):
+    """Lista de adyacencia por nombre de nodo (implementacion previa a CSR)"""
+    adjacency = {}
+    for edge in graph['edges']:
+        if edge['source'] not in adjacency:
+            adjacency[edge['source']] = []
+        adjacency[edge['source']].append(edge['target'])
+    return adjacency
+
+def traced(function, *args):
+    """Ejecuta una funcion y devuelve (resultado, bytes que quedan asignados)"""
+    tracemalloc.start()
+    result = function(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def peak_memory(function, *args):
+    """Ejecuta una funcion y devuelve (segundos, pico de memoria asignada en bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def bfs_visit(start, neighbors):
+    """Recorre en anchura todos los nodos alcanzables y devuelve cuantos visito"""
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        for neighbor in neighbors(queue.popleft()):
+            if neighbor not in seen:
+                seen.add(neighbor)
+                queue.append(neighbor)
+    return len(seen)
+
+def bench_adjacency_memory(layers=100, width=1000):
+    """Compara memoria y recorrido de la adyacencia por nombre, por listas de ids y CSR"""
+    graph = make_layered_graph(layers, width)
+    edges = len(graph['edges'])
+    data = backend.Data(graph)
+
+    by_name, name_bytes = traced(legacy_adjacency, graph)
+    by_id, id_bytes = traced(lambda: [list(data.neighbors(i)) for i in range(len(data.node_names))])
+    csr_bytes = data.adj_offsets.nbytes + data.adj_targets.nbytes
+
+    print(f"Grafo: {len(graph['nodes'])} nodos, {edges} aristas")
+    print(f"Dict por nombre: {name_bytes / edges:.1f} bytes/arista")
+    print(f"Listas de ids:   {id_bytes / edges:.1f} bytes/arista")
+    print(f"CSR int32:       {csr_bytes / edges:.1f} bytes/arista")
+
+    start = data.node_ids['starter']
+    visited, name_time = timed(bfs_visit, 'starter', lambda name: by_name.get(name, []))
+    _, id_time = timed(bfs_visit, start, by_id.__getitem__)
+    _, csr_time = timed(bfs_visit, start, data.neighbors)
+    print(f"BFS sobre {visited} nodos: nombre {name_time * 1000:.1f} ms, "
+          f"listas {id_time * 1000:.1f} ms, CSR {csr_time * 1000:.1f} ms")
+
+def bench_reachability(layers=6, width=8, branches=30, depth=6):
+    """Compara la enumeracion completa con y sin la poda de nodos desconectados"""
+    graph = add_dead_ends(make_layered_graph(layers, width), branches, depth)
+    pruned, prune_time = timed(backend.Data, graph)
+    unpruned = backend.Data(graph)
+    unpruned._build_csr()  # CSR completo, sin la poda
+    
+    ranking, pruned_time = timed(pruned.process_graph)
+    legacy, unpruned_time = timed(unpruned.process_graph)
+    assert ranking == legacy
+    
+    print(f"Grafo: {len(graph['nodes'])} nodos, {len(graph['edges'])} aristas, "
+          f"{len(pruned.disconnected_nodes)} desconectados")
+    print(f"Construccion de Data con poda: {prune_time * 1000:.1f} ms")
+    print(f"Enumeracion de {len(ranking)} caminos sin poda: {unpruned_time * 1000:.1f} ms")
+    print(f"Enumeracion de {len(ranking)} caminos con poda: {pruned_time * 1000:.1f} ms")
+
+def bench_bounded_search(layers=20, width=60, top_n=200):
+    """Compara Yen con la busqueda best-first acotada para el mismo top-k"""
+    data = backend.Data(make_layered_graph(layers, width, fan_out=6))
+    yen, yen_time = timed(data.get_ranking, top_n, "yen")
+    bounded, bounded_time = timed(data.get_ranking, top_n)
+    assert [entry['total_emissions'] for entry in yen] == [entry['total_emissions'] for entry in bounded]
+    
+    stats = data.last_search_stats
+    print(f"Ranking top {top_n}, Yen: {yen_time * 1000:.1f} ms")
+    print(f"Ranking top {top_n}, best-first acotado: {bounded_time * 1000:.1f} ms "
+          f"({stats['expanded']} expandidos, {stats['generated']} generados, {stats['pruned']} podados, {stats['pending']} pendientes)")
+
+def make_tie_graph():
+    """
+    Grafo con caminos de iguales emisiones cuyas sumas derivan en el ultimo bit
+    
+    Por la rama N la cota A* de un parcial queda por encima del costo exacto;
+    por la rama Y el Dijkstra de Yen suma en otro orden y elige el desvio mas caro.
+    """
+    quantities = {"N0": 0.2, "N1": 1.3, "N2": 0.2, "N3": 2.2, "N4": 2.2, "N5": 0.0, "N7": 0.2,
+                  "Y1": 3.1, "Y2": 0.1, "Y3": 3.1, "Y4": 0.3, "Y5": 2.2, "Y6": 0.1}
+    pairs = [("starter", "N0"), ("N0", "N4"), ("N0", "N5"), ("N1", "N2"), ("N2", "end"),
+             ("N3", "N1"), ("N3", "N7"), ("N4", "N1"), ("N5", "N3"), ("N7", "end"),
+             ("starter", "Y5"), ("Y1", "end"), ("Y2", "Y1"), ("Y3", "Y6"), ("Y4", "end"),
+             ("Y5", "Y2"), ("Y5", "Y3"), ("Y5", "Y4"), ("Y6", "end")]
+    nodes = [
+        {"name": "starter", "type": "special", "energy_type": "N/A", "quantity": 0.0,
+         "co2_limits": [0.0, 0.0], "inv_limits": [0.0, 0.0], "position": (0.0, 0.0)},
+        {"name": "end", "type": "special", "energy_type": "N/A", "quantity": 0.0,
+         "co2_limits": [0.0, 0.0], "inv_limits": [0.0, 0.0], "position": (0.0, 0.0)}
+    ]
+    for name, quantity in quantities.items():
+        nodes.append({"name": name, "type": "normal", "energy_type": "Gasolina (L)", "quantity": quantity,
+                      "co2_limits": [0.0, 0.0], "inv_limits": [0.0, 0.0], "position": (0.0, 0.0)})
+    edges = [{"source": source, "target": target, "direction": "unidirectional"} for source, target in pairs]
+    return {"nodes": nodes, "edges": edges}
+
+def check_bounded_ties():
+    """La busqueda acotada y Yen desempatan como la enumeracion completa aunque la suma derive"""
+    data = backend.Data(make_tie_graph())
+    expected = [(entry['total_emissions'], entry['nodes'], entry['path']) for entry in data.process_graph()]
+    for top_n in range(1, len(expected) + 1):
+        for method in ("bounded", "yen"):
+            ranking = [(entry['total_emissions'], entry['nodes'], entry['path'])
+                       for entry in data.get_ranking(top_n, method)]
+            assert ranking == expected[:top_n], (method, top_n, ranking)
+    print(f"Empates de la busqueda acotada y Yen: {len(expected)} caminos en el mismo orden que la enumeracion")
+
+def bench_export(count=20000, directory="."):
+    """Compara memoria pico de la exportacion a Excel con DataFrame y en streaming"""
+    legacy_file = os.path.join(directory, "bench_legacy.xlsx")
+    stream_file = os.path.join(directory, "bench_stream.xlsx")
+    csv_file = os.path.join(directory, "bench_stream.csv")
+    try:
+        legacy_time, legacy_peak = peak_memory(legacy_export_to_excel, synthetic_ranking(count), legacy_file)
+        stream_time, stream_peak = peak_memory(backend.export_to_excel, synthetic_ranking(count), stream_file)
+        csv_time, csv_peak = peak_memory(backend.export_to_csv, synthetic_ranking(count), csv_file)
+    finally:
+        for filename in (legacy_file, stream_file, csv_file):
+            if os.path.exists(filename):
+                os.remove(filename)
+    
+    print(f"Exportacion de {count} caminos")
+    print(f"Excel con DataFrame: {legacy_time:.1f} s, pico {legacy_peak / 2**20:.1f} MiB")
+    print(f"Excel en streaming:  {stream_time:.1f} s, pico {stream_peak / 2**20:.1f} MiB")
+    print(f"CSV en streaming:    {csv_time:.1f} s, pico {csv_peak / 2**20:.1f} MiB")
+
+def legacy_node_emissions(node, emissions_table=backend.EMISSIONS_TABLE):
+    """Emisiones de un nodo con la tabla en diccionario (implementacion previa a los codigos)"""
+    if node['type'] != 'normal':
+        return 0
+    return node['quantity'] * emissions_table.get(node['energy_type'], 0)
+
+def bench_factor_lookup(layers=100, width=1000):
+    """Compara el calculo de emisiones nodo por nodo con la pasada vectorizada por codigos"""
+    nodes = make_layered_graph(layers, width)['nodes']
+    factor_set = factors.default_set()
+    legacy, legacy_time = timed(lambda: [legacy_node_emissions(node) for node in nodes])
+    
+    def vectorized():
+        normal = np.array([node['type'] == 'normal' for node in nodes], dtype=bool)
+        codes = factor_set.encode([node['energy_type'] for node in nodes])
+        quantities = np.array([node['quantity'] for node in nodes], dtype=float)
+        return factor_set.node_weights(codes, quantities, normal)
+    weights, vectorized_time = timed(vectorized)
+    assert weights.tolist() == legacy
+    
+    codes = factor_set.encode([node['energy_type'] for node in nodes])
+    quantities = np.array([node['quantity'] for node in nodes], dtype=float)
+    normal = np.array([node['type'] == 'normal' for node in nodes], dtype=bool)
+    _, lookup_time = timed(factor_set.node_weights, codes, quantities, normal)
+    
+    print(f"Emisiones de {len(nodes)} nodos, nodo por nodo: {legacy_time * 1000:.1f} ms")
+    print(f"Emisiones de {len(nodes)} nodos, codigos + pasada vectorizada: {vectorized_time * 1000:.1f} ms "
+          f"(solo la pasada: {lookup_time * 1000:.2f} ms)")
+
+def bench_sweep(layers=5, width=6, scenarios=500, top_n=5):
+    """Compara el barrido en lote con reconstruir Data y rankear escenario por escenario"""
+    graph = make_layered_graph(layers, width)
+    names = [node['name'] for node in graph['nodes'] if node['type'] == 'normal']
+    sweep, build_time = timed(analysis.ScenarioSweep, graph)
+    draws = analysis.sample(scenarios, {
+        "quantity": {name: (lambda rng, n: rng.uniform(1, 100, n)) for name in names}
+    })
+    
+    def rebuild():
+        rankings = []
+        for scenario in draws:
+            for node in graph['nodes']:
+                if node['name'] in scenario['quantity']:
+                    node['quantity'] = scenario['quantity'][node['name']]
+            rankings.append(backend.Data(graph).get_ranking(top_n))
+        return rankings
+    
+    stats, sweep_time = timed(sweep.stability, draws, top_n)
+    _, rebuild_time = timed(rebuild)
+    print(f"{scenarios} escenarios sobre {len(sweep.paths)} caminos candidatos")
+    print(f"Data + ranking por escenario: {rebuild_time * 1000:.1f} ms")
+    print(f"Barrido en lote: {sweep_time * 1000:.1f} ms (estructura: {build_time * 1000:.1f} ms)")
+    print(f"Caminos que entran al top {top_n} en algun escenario: {len(stats)}")
+
+def bench_uncertainty(layers=6, width=6, samples=10000):
+    """Mide el ranking Monte-Carlo con incertidumbre en cantidades y factores"""
+    sweep = analysis.ScenarioSweep(make_layered_graph(layers, width))
+    ranking, elapsed = timed(sweep.uncertainty, 5, samples)
+    print(f"Monte-Carlo: {samples} muestras x {len(sweep.paths)} caminos en {elapsed * 1000:.1f} ms")
+    for entry in ranking:
+        print(f"  media {entry['mean_emissions']:.1f} [P5 {entry['p5_emissions']:.1f}, "
+              f"P95 {entry['p95_emissions']:.1f}], P(mejor) {entry['best_probability']:.3f}")
+
+def bench_drag(layers=50, width=100, frames=60):
+    """Mide el tiempo por cuadro al arrastrar un nodo en un grafo grande, con y sin el modo de grafos grandes"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import gui
+    app = gui.QApplication.instance() or gui.QApplication([])
+    graph = make_layered_graph(layers, width)
+    for node in graph['nodes']:
+        x, y = node['position']
+        node['position'] = (x * 120.0, y * 60.0)
+    window = gui.MainWindow()
+    window.resize(1280, 800)
+    window.show()
+    editor = window.view
+    _, load_time = timed(editor.load_graph, graph)
+    node = next(n for n in editor.nodes if n.name == f"Instancia {layers // 2}-{width // 2}")
+    editor.centerOn(node)
+    
+    def drag():
+        start = node.pos()
+        for frame in range(frames):
+            node.setPos(start + gui.QPointF(frame * 2.0, frame))
+            app.processEvents()
+        node.setPos(start)
+    
+    print(f"{len(editor.nodes)} nodos, {len(editor.arrows)} flechas cargados en {load_time:.2f} s")
+    for enabled in (False, True):
+        editor.large_graph_mode = not enabled
+        editor.set_large_graph_mode(enabled)
+        drag()
+        _, elapsed = timed(drag)
+        label = "grafo grande" if enabled else "normal"
+        print(f"Modo {label}: {elapsed / frames * 1000:.2f} ms por cuadro")
+    window.close()
+
+def bench_hub_drag(edges=500, moves=4, frames=30):
+    """Compara recalcular las flechas de un nodo central en cada evento con una pasada por cuadro"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import gui
+    app = gui.QApplication.instance() or gui.QApplication([])
+    window = gui.MainWindow()
+    editor = window.view
+    hub = editor.create_node(0.0, 0.0)
+    arrows = []
+    for i in range(edges):
+        angle = 2 * math.pi * i / edges
+        other = editor.create_node(400 * math.cos(angle), 400 * math.sin(angle))
+        arrow = gui.Arrow(hub, other) if i % 2 else gui.Arrow(other, hub)
+        editor.add_arrow_item(arrow)
+        arrows.append(arrow)
+    updates = window.scene.arrow_updates
+    
+    def legacy():
+        for frame in range(frames):
+            for move in range(moves):
+                hub.center += gui.QPointF(1.0, 0.5)
+                for arrow in arrows:
+                    legacy_update_position(arrow)
+    
+    def batched():
+        for frame in range(frames):
+            for move in range(moves):
+                hub.center += gui.QPointF(1.0, 0.5)
+                updates.mark(arrows)
+            updates.flush()
+    
+    _, legacy_time = timed(legacy)
+    _, batched_time = timed(batched)
+    print(f"Nodo con {edges} flechas, {moves} movimientos por cuadro")
+    print(f"Por evento, escalar: {legacy_time / frames * 1000:.2f} ms por cuadro")
+    print(f"Una pasada vectorizada por cuadro: {batched_time / frames * 1000:.2f} ms por cuadro")
+    window.close()
+
+def legacy_edge_registry(pairs, nodes):
+    """Alta de aristas y baja de nodos recorriendo listas (implementacion previa al indice)"""
+    arrows = []
+    for start, end in pairs:
+        if any(a == end and b == start for a, b in arrows):
+            continue
+        if any(a == start and b == end for a, b in arrows):
+            continue
+        arrows.append((start, end))
+    for node in nodes:
+        for arrow in [arrow for arrow in arrows if node in arrow]:
+            arrows.remove(arrow)
+    return arrows
+
+def bench_edge_index(count=2000, edges=6000, seed=0):
+    """Compara altas y bajas masivas en el editor con el registro de aristas por listas"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import gui
+    app = gui.QApplication.instance() or gui.QApplication([])
+    rng = random.Random(seed)
+    pairs = [tuple(rng.sample(range(count), 2)) for _ in range(edges)]
+    _, legacy_time = timed(legacy_edge_registry, pairs, range(count))
+    
+    window = gui.MainWindow()
+    editor = window.view
+    nodes = [editor.create_node(rng.uniform(0, 2000), rng.uniform(0, 2000)) for _ in range(count)]
+    
+    def build():
+        for start, end in pairs:
+            start, end = nodes[start], nodes[end]
+            if editor.check_reverse_connection(start, end) or (start, end) in editor.edges:
+                continue
+            editor.add_arrow_item(gui.Arrow(start, end))
+    
+    def delete():
+        for node in nodes:
+            editor.handle_node_deletion([node])
+    
+    _, build_time = timed(build)
+    added = len(editor.arrows)
+    _, delete_time = timed(delete)
+    print(f"{count} nodos, {added} flechas")
+    print(f"Listas (sólo recorridos, sin Qt): {legacy_time * 1000:.1f} ms")
+    print(f"Editor con índice: alta {build_time * 1000:.1f} ms, baja {delete_time * 1000:.1f} ms")
+    window.close()
+
+def bench_import(layers=100, width=100):
+    """Mide la importación en lote de un grafo sin posiciones, con disposición automática"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import gui
+    app = gui.QApplication.instance() or gui.QApplication([])
+    graph = make_layered_graph(layers, width)
+    for node in graph['nodes']:
+        del node['position']
+    window = gui.MainWindow()
+    window.resize(1280, 800)
+    window.show()
+    _, layout_time = timed(layout.layered_layout, graph)
+    _, import_time = timed(window.view.import_graph, graph)
+    _, paint_time = timed(app.processEvents)
+    print(f"{len(window.view.nodes)} nodos, {len(window.view.arrows)} flechas")
+    print(f"Disposición por capas: {layout_time * 1000:.1f} ms")
+    print(f"Importación (con disposición): {import_time:.2f} s, primer repintado: {paint_time:.2f} s")
+    window.close()
+
+def bench_layout(layers=100, width=100, sample=2000):
+    """Mide la disposición por capas y la dirigida por fuerzas, y el error de Barnes-Hut"""
+    graph = make_layered_graph(layers, width)
+    count = len(graph['nodes'])
+    _, layered_time = timed(layout.layered_layout, graph)
+    _, force_time = timed(layout.force_layout, graph)
+    print(f"{count} nodos, {len(graph['edges'])} aristas")
+    print(f"Por capas: {layered_time * 1000:.1f} ms, por fuerzas ({layout.FORCE_ITERATIONS} iteraciones): {force_time:.2f} s")
+    
+    # Repulsión aproximada contra la exacta O(n²) sobre una muestra
+    rng = np.random.default_rng(0)
+    k = layout.LAYER_GAP * 0.75
+    positions = rng.uniform(0, k * math.sqrt(sample), (sample, 2))
+    delta = positions[:, None, :] - positions[None, :, :]
+    distance2 = (delta ** 2).sum(axis=2)
+    np.fill_diagonal(distance2, np.inf)
+    exact, exact_time = timed(lambda: (delta * (k * k / distance2)[:, :, None]).sum(axis=1))
+    approx, approx_time = timed(layout.repulsion, positions, k)
+    error = np.linalg.norm(approx - exact, axis=1) / np.linalg.norm(exact, axis=1)
+    print(f"Repulsión ({sample} nodos): exacta {exact_time * 1000:.1f} ms, Barnes-Hut {approx_time * 1000:.1f} ms")
+    print(f"Error relativo: mediana {np.median(error):.2%}, p95 {np.percentile(error, 95):.2%}")
+
+if __name__ == '__main__':
+    bench_node_index()
+    print()
+    bench_adjacency_memory()
+    print()
+    bench_reachability()
+    print()
+    bench_bounded_search()
+    print()
+    check_bounded_ties()
+    print()
+    bench_export()
+    print()
+    bench_factor_lookup()
+    print()
+    bench_sweep()
+    print()
+    bench_uncertainty()
+    print()
+    bench_drag()
+    print()
+    bench_hub_drag()
+    print()
+    bench_edge_index()
+    print()
+    bench_import()
+    print()
+    bench_layout()
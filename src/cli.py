@@ -0,0 +1,174 @@
+"""
+Ranking por lotes de grafos guardados, sin interfaz gráfica
+
+Uso:
+    python cli.py escenarios/ --format csv --output resultados/
+    python cli.py grafo.json --mode pareto --format json
+
+Cada archivo es un grafo guardado con storage.save_graph: JSON en el formato
+de GraphEditor.get_graph_representation o binario (.camg). Los escenarios
+de un directorio se procesan en paralelo. Este módulo no importa gui ni
+PySide6.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import analysis
+import backend
+import factors
+import storage
+
+FORMATS = ("json", "csv", "xlsx")
+MODES = ("emissions", "bounded", "yen", "fuzzy", "pareto", "uncertainty")
+
+GRAPH_EXTENSIONS = (".json", ".camg")
+
+def load_data(filename, factor_set=None):
+    """Carga un escenario como backend.Data (los binarios se mapean en memoria)"""
+    if storage.is_binary(filename):
+        return backend.Data.from_arrays(storage.load_arrays(filename), factor_set)
+    return backend.Data(storage.load_graph(filename), factor_set)
+
+def load_factor_set(spec, directory=None):
+    """Conjunto de factores a partir de "nombre" o "nombre:versión" """
+    name, _, version = spec.partition(":")
+    return factors.FactorRegistry(directory).get(name, int(version) if version else None)
+
+def find_scenarios(paths):
+    """Expande directorios a los archivos de grafo que contienen"""
+    scenarios = []
+    for path in paths:
+        if os.path.isdir(path):
+            scenarios.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                    if name.endswith(GRAPH_EXTENSIONS)))
+        else:
+            scenarios.append(path)
+    return scenarios
+
+def rank_graph(data_processor, mode="emissions", top_n=5):
+    """Calcula el ranking de un escenario según el modo pedido"""
+    if mode == "pareto":
+        return data_processor.get_pareto_front(top_n)
+    return data_processor.get_ranking(top_n, mode=mode)
+
+def write_results(ranking, filename, fmt):
+    """Escribe el ranking en JSON, CSV o Excel"""
+    if fmt == "json":
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(ranking, f, ensure_ascii=False, indent=2)
+        return True
+    if fmt == "csv":
+        return backend.export_to_csv(ranking, filename)
+    return backend.export_to_excel(ranking, filename)
+
+def output_filename(filename, output_dir, fmt):
+    """Archivo de resultados de un escenario (conserva la extensión: g0.json y g0.camg no chocan)"""
+    base, extension = os.path.splitext(os.path.basename(filename))
+    if extension:
+        base = f"{base}_{extension[1:]}"
+    return os.path.join(output_dir, f"{base}_ranking.{fmt}")
+
+def process_scenario(filename, output_dir, fmt, mode, top_n, cache_dir=None,
+                     factors_spec="default", factors_dir=None, **uncertainty_options):
+    """Rankea un escenario y escribe su archivo de resultados"""
+    factor_set = load_factor_set(factors_spec, factors_dir)
+    stats = None
+    if mode == "uncertainty":
+        sweep = analysis.ScenarioSweep(storage.load_graph(filename), factor_set)
+        ranking = sweep.uncertainty(top_n, **uncertainty_options)
+        unknown = sorted(sweep.data.unknown_energy_types)
+    elif cache_dir is not None:
+        cache = backend.RankingCache(directory=cache_dir)
+        graph = storage.load_graph(filename)
+        ranking = backend.cached_ranking(graph, top_n, mode, cache=cache, factor_set=factor_set)
+        unknown = factor_set.missing(node.get('energy_type', 'N/A') for node in graph['nodes']
+                                     if node['type'] == 'normal')
+    else:
+        data_processor = load_data(filename, factor_set)
+        ranking = rank_graph(data_processor, mode, top_n)
+        unknown = sorted(data_processor.unknown_energy_types)
+        stats = data_processor.last_search_stats
+    output = output_filename(filename, output_dir, fmt)
+    if not write_results(ranking, output, fmt):
+        raise RuntimeError(f"No se pudo escribir {output}")
+    notes = []
+    if any(entry.get('approximate') for entry in ranking):
+        notes.append("aviso: ranking aproximado (demasiados caminos para evaluarlos todos)")
+    if stats is not None and 'pruned' in stats:
+        notes.append(f"búsqueda acotada: {stats['expanded']} parciales expandidos, {stats['pruned']} podados")
+        if stats.get('exhausted'):
+            notes.append("búsqueda acotada sin presupuesto: el top-k se completó con Yen")
+    return output, len(ranking), unknown, notes
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ranking de caminos por emisiones sin interfaz gráfica")
+    parser.add_argument("paths", nargs="+", help="Archivos de grafo (.json, .camg) o directorios de escenarios")
+    parser.add_argument("--format", choices=FORMATS, default="json", help="Formato de salida")
+    parser.add_argument("--output", default=".", help="Directorio de salida")
+    parser.add_argument("--mode", choices=MODES, default="emissions", help="Tipo de ranking")
+    parser.add_argument("--top-n", type=int, default=5, help="Cantidad de caminos (o tamaño máximo del frente)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directorio de caché de rankings (reutiliza escenarios sin cambios)")
+    parser.add_argument("--factors", default="default",
+                        help="Conjunto de factores de emisión: nombre o nombre:versión")
+    parser.add_argument("--factors-dir", default=None,
+                        help="Directorio con conjuntos de factores en JSON")
+    parser.add_argument("--samples", type=int, default=10000,
+                        help="Muestras Monte-Carlo del modo uncertainty")
+    parser.add_argument("--quantity-cv", type=float, default=0.1,
+                        help="Coeficiente de variación de las cantidades (modo uncertainty)")
+    parser.add_argument("--factor-cv", type=float, default=0.05,
+                        help="Coeficiente de variación de los factores (modo uncertainty)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = find_scenarios(args.paths)
+    if not scenarios:
+        print("No se encontraron escenarios")
+        return 1
+    try:
+        load_factor_set(args.factors, args.factors_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error en los factores de emisión: {e}")
+        return 1
+    # Escenarios homónimos de distintos directorios escribirían el mismo archivo
+    outputs = {}
+    for filename in scenarios:
+        outputs.setdefault(output_filename(filename, args.output, args.format), []).append(filename)
+    collisions = [names for names in outputs.values() if len(names) > 1]
+    if collisions:
+        for names in collisions:
+            print(f"Escenarios con el mismo archivo de salida: {', '.join(names)}")
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+    
+    failures = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            filename: executor.submit(process_scenario, filename, args.output,
+                                      args.format, args.mode, args.top_n, args.cache_dir,
+                                      args.factors, args.factors_dir,
+                                      samples=args.samples, quantity_cv=args.quantity_cv,
+                                      factor_cv=args.factor_cv)
+            for filename in scenarios
+        }
+        for filename, future in futures.items():
+            try:
+                output, count, unknown, notes = future.result()
+                print(f"{filename}: {count} caminos -> {output}")
+                for note in notes:
+                    print(f"{filename}: {note}")
+                if unknown:
+                    print(f"{filename}: aviso: tipos de energía sin factor (0 emisiones): {', '.join(unknown)}")
+            except Exception as e:
+                failures += 1
+                print(f"{filename}: error: {e}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Registro de factores de emisión
+
+Un conjunto de factores (FactorSet) asocia cada tipo de energía a su factor
+de emisión y a un código entero (su posición en el conjunto), de modo que
+las emisiones de todos los nodos se calculan en una sola pasada vectorizada.
+
+Los conjuntos se leen de archivos JSON en un directorio:
+
+    {"name": "chile", "version": 2, "factors": {"Diesel (L)": 2.69, ...}}
+
+Cada archivo se lee una sola vez y el conjunto queda en caché. El conjunto
+"default" (versión 1) es la tabla histórica y no necesita archivo.
+"""
+import json
+import os
+
+import numpy as np
+
+UNKNOWN_CODE = -1
+
+DEFAULT_FACTORS = {
+    "Electricidad (kWh)": 0.429, "Gasolina (L)": 2.26,
+    "Diesel (L)": 2.69, "Bunker (L)": 3.01,
+    "Queroseno (L)": 2.48, "LPG (L)": 1.61,
+    "Gasolina de aviacion (L)": 2.69, "Jet Fuel (L)": 2.46
+}
+
+class FactorSet:
+    """Conjunto versionado de factores de emisión con códigos enteros por tipo de energía"""
+    def __init__(self, name, version, factors):
+        for energy_type, factor in factors.items():
+            if not isinstance(factor, (int, float)) or factor < 0:
+                raise ValueError(f"Factor no válido para '{energy_type}' en {name} v{version}: {factor}")
+        self.name = name
+        self.version = version
+        self.factors = dict(factors)
+        self.energy_types = list(self.factors)
+        self.codes = {energy_type: code for code, energy_type in enumerate(self.energy_types)}
+        # El último elemento es el factor de UNKNOWN_CODE: indexar con -1 da 0
+        self._lookup = np.array(list(self.factors.values()) + [0.0], dtype=float)
+    
+    def encode(self, energy_types):
+        """Códigos enteros de una secuencia de tipos de energía (UNKNOWN_CODE si no figuran)"""
+        codes = self.codes
+        return np.array([codes.get(energy_type, UNKNOWN_CODE) for energy_type in energy_types], dtype=np.int32)
+    
+    def node_weights(self, codes, quantities, normal):
+        """Emisiones de todos los nodos en una pasada: cantidad x factor (0 si es especial)"""
+        return np.where(normal, np.asarray(quantities, dtype=float) * self._lookup[codes], 0.0)
+    
+    def missing(self, energy_types):
+        """Tipos de energía de la secuencia que no tienen factor en el conjunto"""
+        return sorted(set(energy_types) - set(self.codes))
+
+def load_factor_set(filename):
+    """Lee un conjunto de factores desde un archivo JSON"""
+    with open(filename, encoding="utf-8") as f:
+        content = json.load(f)
+    try:
+        return FactorSet(content['name'], int(content['version']), content['factors'])
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"{filename} no es un conjunto de factores válido: {e}")
+
+class FactorRegistry:
+    """Conjuntos de factores disponibles en un directorio de archivos JSON"""
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._sets = {("default", 1): FactorSet("default", 1, DEFAULT_FACTORS)}
+        self._loaded = directory is None
+    
+    def _load(self):
+        """Lee los archivos del directorio la primera vez que se consulta el registro"""
+        if self._loaded:
+            return
+        # Si un archivo falla no se registra ninguno: la próxima consulta vuelve a fallar
+        sets = {}
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".json"):
+                factor_set = load_factor_set(os.path.join(self.directory, filename))
+                sets[(factor_set.name, factor_set.version)] = factor_set
+        self._sets.update(sets)
+        self._loaded = True
+    
+    def available(self):
+        """Lista de (nombre, versión) de los conjuntos registrados"""
+        self._load()
+        return sorted(self._sets)
+    
+    def get(self, name="default", version=None):
+        """Devuelve un conjunto; sin versión, la más reciente"""
+        self._load()
+        if version is None:
+            versions = [v for set_name, v in self._sets if set_name == name]
+            if not versions:
+                raise ValueError(f"Conjunto de factores desconocido: {name}")
+            version = max(versions)
+        if (name, version) not in self._sets:
+            raise ValueError(f"Conjunto de factores desconocido: {name} v{version}")
+        return self._sets[(name, version)]
+
+REGISTRY = FactorRegistry()
+
+def default_set():
+    """Conjunto de factores por defecto (la tabla histórica)"""
+    return REGISTRY.get()
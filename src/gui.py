@@ -1,18 +1,33 @@
 import sys
 import math
-from PySide6.QtCore import Qt, QRectF, QPointF, QLineF, QSize, QLocale
+from PySide6.QtCore import (Qt, QRectF, QPointF, QLineF, QSize, QLocale, QObject, Signal,
+                           QRunnable, QThreadPool, QTimer)
 from PySide6.QtGui import (QPainter, QPen, QBrush, QColor, QAction, QCursor, 
                           QDoubleValidator, QPolygonF, QPainterPath, QPalette)
 from PySide6.QtWidgets import (QApplication, QMainWindow, QGraphicsView, QGraphicsScene,
-                              QGraphicsEllipseItem, QGraphicsTextItem, QToolBar, QDialog,
+                              QGraphicsItem, QGraphicsEllipseItem, QGraphicsSimpleTextItem, QToolBar, QDialog,
                               QVBoxLayout, QLabel, QLineEdit, QPushButton, QGraphicsPathItem,
-                              QWidget, QHBoxLayout, QTextEdit, QComboBox, QFormLayout, QMessageBox)
+                              QWidget, QHBoxLayout, QTextEdit, QComboBox, QFormLayout, QMessageBox,
+                              QProgressDialog)
+import numpy as np
 import pandas as pd
 from PySide6.QtWidgets import QFileDialog
 import backend
+import layout
+import storage
 import os
+import time
 from datetime import datetime
 
+# Modo de grafos grandes: se activa a partir de esta cantidad de nodos
+LARGE_GRAPH_NODES = 500
+# Escala de la vista bajo la cual no se dibujan etiquetas ni puntas de flecha
+LABEL_MIN_LOD = 0.5
+ARROWHEAD_MIN_LOD = 0.35
+ZOOM_STEP = 1.15
+# Constante ya resuelta: itemChange se llama en cada cambio de cada ítem
+POSITION_CHANGED = QGraphicsItem.ItemPositionHasChanged
+
 class NodeDialog(QDialog):
     """Dialogo para editar las propiedades de un nodo normal (no especial)"""
     def __init__(self, node, parent=None, dark_mode=False):
@@ -120,16 +135,7 @@ class NodeDialog(QDialog):
     def setup_energy_type_field(self):
         """Configura el combo box de tipos de energía"""
         self.energy_type = QComboBox()
-        energy_types = [
-            "Electricidad (kWh)",
-            "Gasolina (L)",
-            "Diesel (L)",
-            "Bunker (L)",
-            "Queroseno (L)",
-            "LPG (L)",
-            "Gasolina de aviacion (L)",
-            "Jet Fuel (L)"
-        ]
+        energy_types = self.parent.engine.factor_set.energy_types
         self.energy_type.addItems(energy_types)
         if self.node.energy_type in energy_types:
             self.energy_type.setCurrentText(self.node.energy_type)
@@ -146,6 +152,7 @@ class NodeDialog(QDialog):
         """Configura el campo de cantidad con validacion"""
         self.quantity = QLineEdit(str(self.node.quantity).replace('.', ','))
         validator = QDoubleValidator()
+        validator.setBottom(0)  # El ranking supone cantidades no negativas
         validator.setNotation(QDoubleValidator.StandardNotation)
         locale = validator.locale()
         locale.setNumberOptions(locale.numberOptions() | QLocale.RejectGroupSeparator)
@@ -239,7 +246,7 @@ class NodeDialog(QDialog):
     def accept_changes(self):
         """Valida y guarda los cambios realizados en el nodo"""
         new_name = self.name_input.text()
-        if new_name != self.node.name and new_name in self.parent.view.used_names:
+        if new_name != self.node.name and new_name in self.parent.used_names:
             QMessageBox.warning(self, "Nombre duplicado", 
                               "Ya existe un nodo con este nombre. Por favor elija otro.")
             return
@@ -276,6 +283,9 @@ class NodeDialog(QDialog):
         def parse_float(value):
             return float(value.replace(',', '.')) if value else 0.0
         
+        old_name = self.node.name
+        self.parent.used_names.discard(old_name)
+        self.parent.used_names.add(new_name)
         self.node.name = new_name
         self.node.energy_type = self.energy_type.currentText()
         self.node.quantity = parse_float(self.quantity.text())
@@ -286,6 +296,26 @@ class NodeDialog(QDialog):
         self.node.inversion = parse_float(self.inversion.text())
         self.node.description = self.desc_input.toPlainText()
         self.node.update_text_item()
+        self.parent.engine.update_node(old_name, self.parent.node_data(self.node))
+
+class NodeLabel(QGraphicsSimpleTextItem):
+    """
+    Etiqueta de un nodo que no se dibuja cuando la vista está muy alejada
+    
+    Es texto simple, sin el QTextDocument de QGraphicsTextItem, que es
+    unas cuatro veces más caro de crear; conserva los métodos de
+    QGraphicsTextItem que usan los nodos.
+    """
+    def setPlainText(self, text):
+        self.setText(text)
+    
+    def setDefaultTextColor(self, color):
+        self.setBrush(QBrush(color))
+    
+    def paint(self, painter, option, widget=None):
+        if option.levelOfDetailFromTransform(painter.worldTransform()) < LABEL_MIN_LOD:
+            return
+        super().paint(painter, option, widget)
 
 class SpecialNode(QGraphicsEllipseItem):
     """Nodo especial (starter o end) que no se puede editar ni eliminar pero puede moverse y conectarse"""
@@ -304,28 +334,30 @@ class SpecialNode(QGraphicsEllipseItem):
         self.is_special = True
         self.dark_mode = dark_mode
         
-        self.text_item = QGraphicsTextItem(self.name, self)
+        self.text_item = NodeLabel(self.name, self)
         self.text_item.setPos(radius - self.text_item.boundingRect().width()/2, 
                              radius - self.text_item.boundingRect().height()/2)
         self.text_item.setDefaultTextColor(Qt.white if dark_mode else Qt.black)
         
-        self.arrows = []
+        self.arrows = set()
     
     def add_arrow(self, arrow):
         """Agrega una flecha conectada a este nodo"""
-        self.arrows.append(arrow)
+        self.arrows.add(arrow)
 
     def remove_arrow(self, arrow):
         """Elimina una flecha conectada a este nodo"""
-        if arrow in self.arrows:
-            self.arrows.remove(arrow)
+        self.arrows.discard(arrow)
 
     def itemChange(self, change, value):
         """Actualiza la posición de las flechas cuando se mueve el nodo"""
-        if change == QGraphicsEllipseItem.ItemPositionHasChanged:
+        if change == POSITION_CHANGED:
             self.center = self.pos() + QPointF(self.radius, self.radius)
-            for arrow in self.arrows:
-                arrow.update_position()
+            updates = getattr(self.scene(), 'arrow_updates', None)
+            if updates is None:
+                update_arrows(self.arrows)
+            else:
+                updates.mark(self.arrows)
         return super().itemChange(change, value)
 
     def mouseDoubleClickEvent(self, event):
@@ -360,12 +392,12 @@ class Node(QGraphicsEllipseItem):
         self.is_special = False
         self.dark_mode = dark_mode
         
-        self.text_item = QGraphicsTextItem(self.name, self)
+        self.text_item = NodeLabel(self.name, self)
         self.text_item.setPos(radius - self.text_item.boundingRect().width()/2, 
                              radius - self.text_item.boundingRect().height()/2)
         self.text_item.setDefaultTextColor(Qt.white if dark_mode else Qt.black)
         
-        self.arrows = []
+        self.arrows = set()
     
     def update_properties(self, dialog):
         """Actualiza las propiedades desde el diálogo"""
@@ -388,19 +420,21 @@ class Node(QGraphicsEllipseItem):
     
     def add_arrow(self, arrow):
         """Añade una flecha conectada a este nodo"""
-        self.arrows.append(arrow)
+        self.arrows.add(arrow)
 
     def remove_arrow(self, arrow):
         """Elimina una flecha conectada a este nodo"""
-        if arrow in self.arrows:
-            self.arrows.remove(arrow)
+        self.arrows.discard(arrow)
 
     def itemChange(self, change, value):
         """Actualiza la posición de las flechas cuando se mueve el nodo"""
-        if change == QGraphicsEllipseItem.ItemPositionHasChanged:
+        if change == POSITION_CHANGED:
             self.center = self.pos() + QPointF(self.radius, self.radius)
-            for arrow in self.arrows:
-                arrow.update_position()
+            updates = getattr(self.scene(), 'arrow_updates', None)
+            if updates is None:
+                update_arrows(self.arrows)
+            else:
+                updates.mark(self.arrows)
         return super().itemChange(change, value)
 
     def mouseDoubleClickEvent(self, event):
@@ -415,11 +449,17 @@ class Node(QGraphicsEllipseItem):
 
 class Arrow(QGraphicsPathItem):
     """Flecha que conecta dos nodos"""
-    def __init__(self, start_node, end_node, dark_mode=False):
+    def __init__(self, start_node, end_node, dark_mode=False, update=True):
         super().__init__()
         self.start_node = start_node
         self.end_node = end_node
         self.arrow_size = 12
+        # Tramo y punta por separado: dibujarlos directamente es mucho más
+        # barato que trazar el QPainterPath, que queda para la forma del ítem
+        self.line = None
+        self.head = None
+        self.segment = None  # (x1, y1, x2, y2) del tramo, para detectar si se movió
+        self.cull_to_exposed = False
         self.setZValue(-1)
         self.dark_mode = dark_mode
         self.update_pen_color()
@@ -427,7 +467,9 @@ class Arrow(QGraphicsPathItem):
         self.start_node.add_arrow(self)
         self.end_node.add_arrow(self)
         
-        self.update_position()
+        # Con update=False la geometría queda para una pasada conjunta (update_arrows)
+        if update:
+            self.update_position()
     
     def update_pen_color(self):
         """Actualiza el color de la flecha según el modo"""
@@ -436,55 +478,142 @@ class Arrow(QGraphicsPathItem):
     
     def update_position(self):
         """Actualiza la posición de la flecha cuando se mueven los nodos"""
-        if not self.start_node or not self.end_node:
-            return
-
-        line = QLineF(self.start_node.center, self.end_node.center)
-
-        if line.length() == 0:
-            return
-
-        angle = math.atan2(line.dy(), line.dx())
-        
-        start_point = self.start_node.center + QPointF(
-            math.cos(angle) * self.start_node.radius,
-            math.sin(angle) * self.start_node.radius
-        )
-        end_point = self.end_node.center - QPointF(
-            math.cos(angle) * self.end_node.radius,
-            math.sin(angle) * self.end_node.radius
-        )
+        update_arrows([self])
 
+    def set_geometry(self, x1, y1, x2, y2, head_x1, head_y1, head_x2, head_y2):
+        """Reconstruye el trazo de la flecha a partir de sus extremos y la punta"""
+        self.segment = (x1, y1, x2, y2)
+        start_point = QPointF(x1, y1)
+        end_point = QPointF(x2, y2)
+        arrow_point1 = QPointF(head_x1, head_y1)
+        arrow_point2 = QPointF(head_x2, head_y2)
+        self.line = QLineF(start_point, end_point)
         path = QPainterPath()
         path.moveTo(start_point)
         path.lineTo(end_point)
 
-        arrow_head = QPolygonF()
-        arrow_head.append(end_point)
-        
-        arrow_point1 = end_point - QPointF(
-            math.cos(angle + math.pi/6) * self.arrow_size,
-            math.sin(angle + math.pi/6) * self.arrow_size
-        )
-        arrow_point2 = end_point - QPointF(
-            math.cos(angle - math.pi/6) * self.arrow_size,
-            math.sin(angle - math.pi/6) * self.arrow_size
-        )
-        
-        arrow_head.append(arrow_point1)
-        arrow_head.append(arrow_point2)
-        arrow_head.append(end_point)
-
+        arrow_head = QPolygonF([end_point, arrow_point1, arrow_point2, end_point])
         path.addPolygon(arrow_head)
+        self.head = arrow_head
         self.setPath(path)
+    
+    def set_culling(self, enabled):
+        """Omite el dibujo si el tramo no cruza la región expuesta (requiere exposedRect)"""
+        self.cull_to_exposed = enabled
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, enabled)
+    
+    def crosses(self, rect):
+        """Indica si el tramo de la flecha pasa por el rectángulo (recorte de Liang-Barsky)"""
+        x1, y1, x2, y2 = self.line.x1(), self.line.y1(), self.line.x2(), self.line.y2()
+        dx, dy = x2 - x1, y2 - y1
+        low, high = 0.0, 1.0
+        for p, q in ((-dx, x1 - rect.left()), (dx, rect.right() - x1),
+                     (-dy, y1 - rect.top()), (dy, rect.bottom() - y1)):
+            if p == 0:
+                if q < 0:
+                    return False
+            elif p < 0:
+                low = max(low, q / p)
+            else:
+                high = min(high, q / p)
+            if low > high:
+                return False
+        return True
+    
+    def paint(self, painter, option, widget=None):
+        """Dibuja la línea y la punta; con la vista muy alejada, sólo la línea"""
+        if self.line is None:
+            return
+        # En grafos grandes, las diagonales largas tocan la región repintada sólo
+        # con su rectángulo envolvente: se omiten si el tramo no la cruza
+        if (self.cull_to_exposed and
+                not self.crosses(option.exposedRect.adjusted(-self.arrow_size, -self.arrow_size,
+                                                             self.arrow_size, self.arrow_size))):
+            return
+        painter.setPen(self.pen())
+        painter.drawLine(self.line)
+        if option.levelOfDetailFromTransform(painter.worldTransform()) >= ARROWHEAD_MIN_LOD:
+            painter.drawPolyline(self.head)
 
     def remove(self):
         """Elimina la flecha de los nodos y de la escena"""
         self.start_node.remove_arrow(self)
         self.end_node.remove_arrow(self)
         if self.scene():
+            updates = getattr(self.scene(), 'arrow_updates', None)
+            if updates is not None:
+                updates.discard(self)
             self.scene().removeItem(self)
 
+def arrow_geometry(starts, ends, start_radii, end_radii, sizes):
+    """
+    Geometría de varias flechas en una sola pasada vectorizada
+    
+    starts y ends son los centros (n x 2) de los nodos de cada flecha. Devuelve
+    los extremos del tramo, recortados al borde de cada nodo, los dos vértices
+    de la punta y una máscara de las flechas con largo distinto de cero.
+    """
+    delta = ends - starts
+    angle = np.arctan2(delta[:, 1], delta[:, 0])
+    direction = np.column_stack((np.cos(angle), np.sin(angle)))
+    start_points = starts + direction * start_radii[:, None]
+    end_points = ends - direction * end_radii[:, None]
+    point1 = end_points - np.column_stack((np.cos(angle + math.pi / 6), np.sin(angle + math.pi / 6))) * sizes[:, None]
+    point2 = end_points - np.column_stack((np.cos(angle - math.pi / 6), np.sin(angle - math.pi / 6))) * sizes[:, None]
+    return start_points, end_points, point1, point2, np.any(delta != 0, axis=1)
+
+def update_arrows(arrows):
+    """Recalcula la geometría de las flechas y re-traza sólo las que cambiaron"""
+    arrows = [arrow for arrow in arrows if arrow.start_node and arrow.end_node]
+    if not arrows:
+        return
+    values = np.array([(arrow.start_node.center.x(), arrow.start_node.center.y(),
+                        arrow.end_node.center.x(), arrow.end_node.center.y(),
+                        arrow.start_node.radius, arrow.end_node.radius, arrow.arrow_size)
+                       for arrow in arrows], dtype=float)
+    start_points, end_points, point1, point2, valid = arrow_geometry(
+        values[:, 0:2], values[:, 2:4], values[:, 4], values[:, 5], values[:, 6])
+    
+    geometry = np.hstack((start_points, end_points, point1, point2))
+    unset = (np.nan,) * 4
+    previous = np.array([arrow.segment or unset for arrow in arrows], dtype=float)
+    changed = np.flatnonzero(valid & ~np.all(geometry[:, :4] == previous, axis=1))
+    for i, row in zip(changed.tolist(), geometry[changed].tolist()):
+        arrows[i].set_geometry(*row)
+
+class ArrowUpdates:
+    """
+    Flechas pendientes de recalcular mientras se arrastran nodos
+    
+    Los cambios de posición sólo marcan las flechas; un temporizador de
+    intervalo cero las recalcula todas juntas cuando el bucle de eventos
+    termina de procesar los movimientos pendientes, una vez por cuadro.
+    """
+    def __init__(self):
+        self.dirty = set()
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.flush)
+    
+    def mark(self, arrows):
+        """Marca flechas para la próxima pasada"""
+        if not arrows:
+            return
+        self.dirty.update(arrows)
+        if not self.timer.isActive():
+            self.timer.start()
+    
+    def discard(self, arrow):
+        """Quita una flecha eliminada de la pasada pendiente"""
+        self.dirty.discard(arrow)
+    
+    def flush(self):
+        """Recalcula de una vez todas las flechas marcadas"""
+        self.timer.stop()
+        arrows, self.dirty = self.dirty, set()
+        update_arrows(arrows)
+
 class GraphEditor(QGraphicsView):
     """Vista principal del editor de grafos"""
     def __init__(self, scene):
@@ -492,17 +621,25 @@ class GraphEditor(QGraphicsView):
         self.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
         self.setInteractive(True)
         self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.large_graph_mode = False
         
-        self.nodes = []
-        self.arrows = []
+        # Registros de nodos y flechas: diccionarios usados como conjuntos, que
+        # conservan el orden de inserción para guardar el grafo siempre igual
+        self.nodes = {}
+        self.arrows = {}
+        self.edges = {}  # (nodo origen, nodo destino) -> Arrow
         self.used_names = set()
         self._creating_arrow = False
         self._deleting_arrow = False
         self._deleting_node = False
         self.start_node = None
         
+        # Motor de ranking incremental, alimentado por los eventos de edicion
+        self.engine = backend.RankingEngine()
+        
         # Crear nodos iniciales
         self.create_initial_nodes()
     
@@ -510,15 +647,11 @@ class GraphEditor(QGraphicsView):
         """Crea los nodos iniciales (starter y end)"""
         # Nodo starter (verde)
         starter = SpecialNode(100, 100, "starter")
-        self.scene().addItem(starter)
-        self.nodes.append(starter)
-        self.used_names.add(starter.name)
+        self.add_node_item(starter)
         
         # Nodo end (rojo)
         end = SpecialNode(300, 100, "end")
-        self.scene().addItem(end)
-        self.nodes.append(end)
-        self.used_names.add(end.name)
+        self.add_node_item(end)
     
     @property
     def creating_arrow(self):
@@ -552,10 +685,28 @@ class GraphEditor(QGraphicsView):
     
     def check_reverse_connection(self, start, end):
         """Verifica si ya existe una conexión en dirección opuesta"""
-        for arrow in self.arrows:
-            if arrow.start_node == end and arrow.end_node == start:
-                return True
-        return False
+        return (end, start) in self.edges
+    
+    def add_node_item(self, node):
+        """Agrega un nodo a la escena, a los registros y al motor de ranking"""
+        self.scene().addItem(node)
+        self.nodes[node] = None
+        self.used_names.add(node.name)
+        self.engine.add_node(self.node_data(node))
+    
+    def add_arrow_item(self, arrow):
+        """Agrega una flecha a la escena, al índice de aristas y al motor de ranking"""
+        self.scene().addItem(arrow)
+        self.arrows[arrow] = None
+        self.edges[(arrow.start_node, arrow.end_node)] = arrow
+        self.engine.add_edge(arrow.start_node.name, arrow.end_node.name)
+    
+    def remove_arrow_item(self, arrow):
+        """Quita una flecha de la escena, del índice de aristas y del motor de ranking"""
+        arrow.remove()
+        self.arrows.pop(arrow, None)
+        self.edges.pop((arrow.start_node, arrow.end_node), None)
+        self.engine.remove_edge(arrow.start_node.name, arrow.end_node.name)
     
     def mousePressEvent(self, event):
         """Maneja los eventos de clic del mouse"""
@@ -615,15 +766,14 @@ class GraphEditor(QGraphicsView):
                         return
                     
                     # Verificar conexión directa existente
-                    for arrow in self.arrows:
-                        if arrow.start_node == self.start_node and arrow.end_node == item:
-                            QMessageBox.warning(self, "Conexión existente",
-                                            "Ya existe una conexión entre estos nodos.")
-                            return
+                    if (self.start_node, item) in self.edges:
+                        QMessageBox.warning(self, "Conexión existente",
+                                        "Ya existe una conexión entre estos nodos.")
+                        return
                     
                     new_arrow = Arrow(self.start_node, item, dark_mode=self.main_window.dark_mode)
-                    self.scene().addItem(new_arrow)
-                    self.arrows.append(new_arrow)
+                    new_arrow.set_culling(self.large_graph_mode)
+                    self.add_arrow_item(new_arrow)
                 
                     self.start_node.setSelected(False)
                     self.creating_arrow = False
@@ -639,9 +789,7 @@ class GraphEditor(QGraphicsView):
         """Maneja la eliminación de flechas"""
         for item in items:
             if isinstance(item, Arrow):
-                item.remove()
-                if item in self.arrows:
-                    self.arrows.remove(item)
+                self.remove_arrow_item(item)
                 return
         
         self.deleting_arrow = False
@@ -651,20 +799,16 @@ class GraphEditor(QGraphicsView):
         """Maneja la eliminación de nodos (excepto los especiales)"""
         for item in items:
             if isinstance(item, Node) and not getattr(item, 'is_special', False):
-                if item.name in self.used_names:
-                    self.used_names.remove(item.name)
+                self.used_names.discard(item.name)
                 
-                arrows_to_remove = [arrow for arrow in self.arrows 
-                                  if arrow.start_node == item or arrow.end_node == item]
-                
-                for arrow in arrows_to_remove:
-                    arrow.remove()
-                    if arrow in self.arrows:
-                        self.arrows.remove(arrow)
+                # Sólo las flechas del nodo, a partir de su conjunto de incidentes
+                for arrow in list(item.arrows):
+                    self.remove_arrow_item(arrow)
                 
                 self.scene().removeItem(item)
-                if item in self.nodes:
-                    self.nodes.remove(item)
+                self.nodes.pop(item, None)
+                self.engine.remove_node(item.name)
+                self.update_render_mode()
                 return
         
         self.deleting_node = False
@@ -673,16 +817,223 @@ class GraphEditor(QGraphicsView):
     def create_node(self, x, y):
         """Crea un nuevo nodo normal en la posición especificada"""
         node = Node(x, y, dark_mode=self.main_window.dark_mode)
-        self.scene().addItem(node)
-        self.nodes.append(node)
-        self.used_names.add(node.name)
+        self.set_node_cache(node)
+        self.add_node_item(node)
+        self.update_render_mode()
         return node
     
+    def wheelEvent(self, event):
+        """Zoom con la rueda del mouse, centrado en el cursor"""
+        factor = ZOOM_STEP if event.angleDelta().y() > 0 else 1 / ZOOM_STEP
+        self.scale(factor, factor)
+    
+    def set_node_cache(self, node):
+        """Caché de dibujo del nodo y su etiqueta según el modo de la vista"""
+        cache = QGraphicsItem.DeviceCoordinateCache if self.large_graph_mode else QGraphicsItem.NoCache
+        node.setCacheMode(cache)
+        node.text_item.setCacheMode(cache)
+    
+    def update_render_mode(self):
+        """Activa o desactiva el modo de grafos grandes según la cantidad de nodos"""
+        self.set_large_graph_mode(len(self.nodes) >= LARGE_GRAPH_NODES)
+    
+    def set_large_graph_mode(self, enabled):
+        """
+        Ajusta la vista para grafos grandes
+        
+        Repinta sólo las regiones modificadas, guarda nodos y etiquetas en caché
+        de dispositivo e indexa la escena con un árbol BSP, con profundidad
+        según la cantidad de ítems (unos 20 por hoja). Con pocos nodos vuelve al
+        repintado completo, sin caché ni índice.
+        """
+        if enabled == self.large_graph_mode:
+            return
+        self.large_graph_mode = enabled
+        scene = self.scene()
+        if enabled:
+            self.setViewportUpdateMode(QGraphicsView.MinimalViewportUpdate)
+            self.setOptimizationFlag(QGraphicsView.DontSavePainterState, True)
+            items = 2 * len(self.nodes) + len(self.arrows)
+            scene.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+            scene.setBspTreeDepth(max(4, min(12, int(math.log2(max(items, 1) / 20) + 1))))
+        else:
+            self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+            self.setOptimizationFlag(QGraphicsView.DontSavePainterState, False)
+            scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        # La escena puede exceder la ventana: barras de desplazamiento sólo en este modo
+        policy = Qt.ScrollBarAsNeeded if enabled else Qt.ScrollBarAlwaysOff
+        self.setHorizontalScrollBarPolicy(policy)
+        self.setVerticalScrollBarPolicy(policy)
+        for node in self.nodes:
+            self.set_node_cache(node)
+        for arrow in self.arrows:
+            arrow.set_culling(enabled)
+    
+    def clear_graph(self):
+        """Elimina todos los nodos y flechas de la escena"""
+        for arrow in self.arrows:
+            arrow.remove()
+        for node in self.nodes:
+            self.scene().removeItem(node)
+        self.nodes.clear()
+        self.arrows.clear()
+        self.edges.clear()
+        self.used_names.clear()
+        self.start_node = None
+        self.engine.clear()
+        self.update_render_mode()
+    
+    def import_graph(self, source, relayout=None):
+        """
+        Carga un grafo desde un diccionario o un archivo de storage
+        
+        Si el grafo no trae posiciones (o relayout es True) se dispone con
+        layout.compute_layout antes de crear los ítems. Devuelve las aristas
+        omitidas (ver load_graph). Un grafo inválido lanza ValueError sin
+        tocar el grafo actual.
+        """
+        graph = storage.load_graph(source) if isinstance(source, str) else source
+        self._check_graph(graph)
+        if relayout or (relayout is None and layout.needs_layout(graph)):
+            graph = layout.apply_layout(graph, layout.compute_layout(graph))
+        return self.load_graph(graph)
+    
+    def relayout(self, method="auto"):
+        """Vuelve a disponer los nodos del grafo actual con layout.compute_layout"""
+        positions = layout.compute_layout(self.get_graph_representation(), method)
+        for node in self.nodes:
+            x, y = positions[node.name]
+            node.setPos(x - node.radius, y - node.radius)
+        # Una sola pasada de geometría para todas las flechas movidas
+        updates = getattr(self.scene(), 'arrow_updates', None)
+        if updates is not None:
+            updates.flush()
+        self.main_window.update_scene_rect()
+        starter = next((node for node in self.nodes if node.name == "starter"), None)
+        if starter is not None:
+            self.centerOn(starter)
+    
+    def load_graph(self, graph):
+        """
+        Reemplaza el grafo del editor por uno en formato get_graph_representation
+        
+        Crea todos los ítems en un solo lote: la escena queda sin índice y sin
+        señales y la vista sin repintar hasta terminar; la geometría de las
+        flechas se calcula en una sola pasada y el índice BSP, si corresponde,
+        se arma una vez al final.
+        
+        Las aristas que el editor no permite crear (lazos, duplicadas o
+        inversas de una ya cargada) se omiten; devuelve la lista de pares
+        (source, target) omitidos. Un grafo inválido (ver _check_graph) lanza
+        ValueError antes de borrar el actual.
+        """
+        self._check_graph(graph)
+        dark_mode = self.main_window.dark_mode
+        self.clear_graph()
+        
+        scene = self.scene()
+        scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+        scene.blockSignals(True)
+        self.setUpdatesEnabled(False)
+        try:
+            by_name, skipped = self._build_items(graph, dark_mode)
+        finally:
+            scene.blockSignals(False)
+            self.setUpdatesEnabled(True)
+        self.update_render_mode()
+        self.main_window.update_scene_rect()
+        if "starter" in by_name:
+            self.centerOn(by_name["starter"])
+        
+        # Evitar que los nodos nuevos repitan nombres automáticos ya cargados
+        for name in self.used_names:
+            prefix, _, number = name.partition(" ")
+            if prefix == "Instancia" and number.isdigit():
+                Node._next_id = max(Node._next_id, int(number) + 1)
+        return skipped
+    
+    def _check_graph(self, graph):
+        """Rechaza nodos con tipo desconocido o nombre repetido y aristas hacia nodos que no existen"""
+        names = set()
+        repeated = []
+        for data in graph['nodes']:
+            if data['type'] not in ('special', 'normal'):
+                raise ValueError(f"Tipo de nodo no válido en {data['name']}: {data['type']}")
+            if data['name'] in names:
+                repeated.append(data['name'])
+            names.add(data['name'])
+        if repeated:
+            raise ValueError(f"Nombres de nodo repetidos: {', '.join(repeated[:20])}")
+        
+        missing = sorted({name for edge in graph['edges'] for name in (edge['source'], edge['target'])
+                          if name not in names})
+        if missing:
+            raise ValueError(f"Aristas hacia nodos que no existen: {', '.join(missing[:20])}")
+    
+    def _build_items(self, graph, dark_mode):
+        """Crea los nodos y flechas de un grafo (parte de load_graph)"""
+        by_name = {}
+        for data in graph['nodes']:
+            x, y = data.get('position', (0.0, 0.0))
+            if data['type'] == 'special':
+                node = SpecialNode(x, y, data['name'], dark_mode=dark_mode)
+            else:
+                node = Node(x, y, dark_mode=dark_mode)
+                node.name = data['name']
+                node.energy_type = data.get('energy_type', node.energy_type)
+                node.quantity = data.get('quantity', 0.0)
+                node.co2_min, node.co2_max = data.get('co2_limits', (0.0, 0.0))
+                node.inv_min, node.inv_max = data.get('inv_limits', (0.0, 0.0))
+                node.inversion = data.get('inversion', 0.0)
+                node.description = data.get('description', '')
+                node.update_text_item()
+            self.add_node_item(node)
+            by_name[node.name] = node
+        
+        skipped = []
+        for edge in graph['edges']:
+            start, end = by_name[edge['source']], by_name[edge['target']]
+            # Mismas reglas que al crear una flecha en el editor
+            if start is end or (start, end) in self.edges or self.check_reverse_connection(start, end):
+                skipped.append((edge['source'], edge['target']))
+                continue
+            arrow = Arrow(start, end, dark_mode=dark_mode, update=False)
+            self.add_arrow_item(arrow)
+        update_arrows(self.arrows)
+        return by_name, skipped
+    
+    def mark_disconnected(self, names):
+        """Resalta los nodos que no están en ningún camino starter -> end"""
+        names = set(names)
+        for node in self.nodes:
+            if node.name in names:
+                node.setPen(QPen(QColor(255, 140, 0), 3, Qt.DashLine))
+                node.setToolTip("Sin camino starter → end: no se considera en el ranking")
+            else:
+                node.setPen(QPen())
+                node.setToolTip("")
+    
     def update_toolbar_states(self):
         """Actualiza el estado de los botones en la barra de herramientas"""
         if hasattr(self, 'main_window'):
             self.main_window.update_toolbar_states()
     
+    def node_data(self, node):
+        """Devuelve los datos de un nodo en formato diccionario"""
+        return {
+            "name": node.name,
+            "type": "special" if node.is_special else "normal",
+            "energy_type": getattr(node, 'energy_type', 'N/A'),
+            "quantity": getattr(node, 'quantity', 0.0),
+            "co2_limits": [getattr(node, 'co2_min', 0.0), 
+                          getattr(node, 'co2_max', 0.0)],
+            "inv_limits": [getattr(node, 'inv_min', 0.0), 
+                          getattr(node, 'inv_max', 0.0)],
+            "inversion": getattr(node, 'inversion', 0.0),
+            "description": getattr(node, 'description', ''),
+            "position": (node.center.x(), node.center.y())
+        }
+    
     def get_graph_representation(self):
         """Devuelve la estructura del grafo en formato diccionario"""
         graph = {
@@ -692,18 +1043,7 @@ class GraphEditor(QGraphicsView):
         
         # Recoger datos de los nodos
         for node in self.nodes:
-            node_data = {
-                "name": node.name,
-                "type": "special" if node.is_special else "normal",
-                "energy_type": getattr(node, 'energy_type', 'N/A'),
-                "quantity": getattr(node, 'quantity', 0.0),
-                "co2_limits": [getattr(node, 'co2_min', 0.0), 
-                              getattr(node, 'co2_max', 0.0)],
-                "inv_limits": [getattr(node, 'inv_min', 0.0), 
-                              getattr(node, 'inv_max', 0.0)],
-                "position": (node.center.x(), node.center.y())
-            }
-            graph["nodes"].append(node_data)
+            graph["nodes"].append(self.node_data(node))
         
         # Recoger datos de las conexiones
         for arrow in self.arrows:
@@ -737,11 +1077,13 @@ class GraphEditor(QGraphicsView):
 
 class ResultsDialog(QDialog):
     """Dialogo para mostrar los resultados del modelo"""
-    def __init__(self, ranking, parent=None, dark_mode=False):
+    def __init__(self, ranking, parent=None, dark_mode=False,
+                 title="Top 5 Caminos con Menores Emisiones:"):
         super().__init__(parent)
         self.setWindowTitle("Ranking de Caminos")
         self.setMinimumSize(600, 400)
         self.dark_mode = dark_mode
+        self.title = title
         
         self.setup_palette()
         self.setup_ui(ranking)
@@ -793,7 +1135,7 @@ class ResultsDialog(QDialog):
         layout = QVBoxLayout()
         
         # Título
-        title = QLabel("Top 5 Caminos con Menores Emisiones:")
+        title = QLabel(self.title)
         title.setStyleSheet(f"font-weight: bold; font-size: 14px; color: {'white' if self.dark_mode else 'black'};")
         layout.addWidget(title)
         
@@ -807,6 +1149,10 @@ class ResultsDialog(QDialog):
                 path_str = " → ".join(path_info['path'])
                 emissions = f"{path_info['total_emissions']:.2f} ton CO2"
                 text = f"{i}. {path_str} - {emissions}"
+                if 'total_investment' in path_info:
+                    text += f" - {path_info['total_investment']:.2f} USD"
+                if 'score' in path_info:
+                    text += f" - Evaluacion: {path_info['score']:.3f}"
                 label = QLabel(text)
                 label.setStyleSheet(f"color: {'white' if self.dark_mode else 'black'};")
                 layout.addWidget(label)
@@ -826,6 +1172,61 @@ class ResultsDialog(QDialog):
         layout.addLayout(btn_layout)
         self.setLayout(layout)
 
+class RankingSignals(QObject):
+    """Señales emitidas por RankingWorker hacia el hilo de la interfaz"""
+    progress = Signal(int, object, object)
+    finished = Signal(list)
+    cancelled = Signal()
+    failed = Signal(str)
+
+class RankingWorker(QRunnable):
+    """Calcula el ranking en un hilo del QThreadPool, con progreso y cancelacion"""
+    def __init__(self, data_processor, top_n=5, report_interval=0.1):
+        super().__init__()
+        self.data_processor = data_processor
+        self.top_n = top_n
+        self.report_interval = report_interval
+        self.signals = RankingSignals()
+        self.best = None
+        self._last_report = 0.0
+        self.data_processor.progress_callback = self.report_progress
+    
+    def cancel(self):
+        """Pide la cancelacion; la busqueda se detiene en el siguiente paso"""
+        self.data_processor.cancelled = True
+    
+    def pruned(self):
+        """Caminos parciales podados por la búsqueda acotada (None con Yen)"""
+        stats = self.data_processor.last_search_stats
+        return stats['pruned'] if stats else None
+    
+    def report_progress(self, explored):
+        """Emite el progreso como mucho cada report_interval segundos"""
+        now = time.monotonic()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            self.signals.progress.emit(explored, self.best, self.pruned())
+    
+    def run(self):
+        """Consume el generador de caminos hasta completar el top-k"""
+        ranking = []
+        try:
+            for entry in self.data_processor.iter_ranked_paths(self.top_n):
+                if self.best is None:
+                    self.best = entry['total_emissions']
+                ranking.append(entry)
+                self.signals.progress.emit(self.data_processor.paths_explored, self.best, self.pruned())
+                if len(ranking) >= self.top_n or self.data_processor.cancelled:
+                    break
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        
+        if self.data_processor.cancelled:
+            self.signals.cancelled.emit()
+        else:
+            self.signals.finished.emit(ranking)
+
 class MainWindow(QMainWindow):
     """Ventana principal de la aplicación"""
     def __init__(self):
@@ -833,6 +1234,7 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Camaleon PSV Pro")
         self.setMinimumSize(800, 600)
         self.dark_mode = False
+        self.ranking_worker = None
         
         # Configuración de la escena
         self.setup_scene()
@@ -850,6 +1252,7 @@ class MainWindow(QMainWindow):
         self.view = GraphEditor(self.scene)
         self.view.main_window = self
         self.scene.arrows = self.view.arrows
+        self.scene.arrow_updates = ArrowUpdates()
     
     def setup_ui(self):
         """Configura la interfaz de usuario"""
@@ -870,11 +1273,15 @@ class MainWindow(QMainWindow):
         
         self.create_actions()
         self.toolbar.addActions([
+            self.open_graph_action,
+            self.save_graph_action,
             self.add_node_action,
             self.remove_node_action,
             self.remove_arrow_action,
             self.create_arrow_action,
             self.run_model_action,
+            self.pareto_action,
+            self.layout_action,
             self.dark_mode_action
         ])
     
@@ -885,7 +1292,11 @@ class MainWindow(QMainWindow):
         self.remove_arrow_action = self.create_action("Eliminar Flecha", "Eliminar flecha", self.toggle_remove_arrow, checkable=True)
         self.create_arrow_action = self.create_action("Crear Flecha", "Crear flecha entre nodos", self.toggle_create_arrow, checkable=True)
         self.run_model_action = self.create_action("Ejecutar Modelo", "Ejecutar el modelo de optimización", self.run_model)
+        self.pareto_action = self.create_action("Frente de Pareto", "Caminos no dominados en emisiones e inversion", self.run_pareto)
+        self.layout_action = self.create_action("Disponer Grafo", "Reubicar los nodos automáticamente", self.relayout_graph)
         self.dark_mode_action = self.create_action("Modo Oscuro", "Alternar modo oscuro/claro", self.toggle_dark_mode, checkable=True)
+        self.save_graph_action = self.create_action("Guardar Grafo", "Guardar el grafo en un archivo", self.save_graph)
+        self.open_graph_action = self.create_action("Abrir Grafo", "Abrir un grafo guardado", self.open_graph)
     
     def create_action(self, text, tooltip, callback, checkable=False):
         """Crea una acción con los parámetros dados"""
@@ -997,27 +1408,170 @@ class MainWindow(QMainWindow):
         """Devuelve la representación del grafo actual"""
         return self.view.get_graph_representation()
     
+    def save_graph(self):
+        """Guarda el grafo actual en formato binario (.camg) o JSON"""
+        default_name = f"Grafo_Camaleon_{datetime.now().strftime('%Y%m%d_%H%M')}.camg"
+        filename, _ = QFileDialog.getSaveFileName(
+            self,
+            "Guardar grafo",
+            os.path.join(os.path.expanduser("~"), "Documents", default_name),
+            "Grafo binario (*.camg);;Grafo JSON (*.json)"
+        )
+        if not filename:
+            return
+        try:
+            storage.save_graph(self.get_current_graph(), filename)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"No se pudo guardar el grafo:\n{e}")
+    
+    def open_graph(self):
+        """Carga un grafo guardado en el editor"""
+        filename, _ = QFileDialog.getOpenFileName(
+            self,
+            "Abrir grafo",
+            os.path.join(os.path.expanduser("~"), "Documents"),
+            "Grafos (*.camg *.json)"
+        )
+        if not filename:
+            return
+        try:
+            graph = storage.load_graph(filename)
+            # Los grafos generados (por ejemplo desde un ERP) no traen posiciones
+            skipped = self.view.import_graph(graph)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"No se pudo abrir el grafo:\n{e}")
+            return
+        if skipped:
+            lines = [f"{source} → {target}" for source, target in skipped[:20]]
+            if len(skipped) > 20:
+                lines.append(f"... y {len(skipped) - 20} más")
+            QMessageBox.warning(self, "Aristas omitidas",
+                                "Estas aristas son lazos, duplicadas o inversas de otra y no se cargaron:\n"
+                                + "\n".join(lines))
+    
+    def relayout_graph(self):
+        """Dispone automáticamente el grafo del editor"""
+        if not self.view.nodes:
+            return
+        self.view.relayout()
+    
     def resizeEvent(self, event):
         """Ajusta el tamaño de la escena cuando se redimensiona la ventana"""
-        size = event.size()
-        self.view.setSceneRect(QRectF(QPointF(0.0, 0.0), 
-                              QPointF(float(size.width()), float(size.height()))))
         super().resizeEvent(event)
+        self.update_scene_rect()
+    
+    def update_scene_rect(self):
+        """Escena del tamaño de la ventana; en grafos grandes abarca además todos los ítems"""
+        size = self.size()
+        rect = QRectF(QPointF(0.0, 0.0), QPointF(float(size.width()), float(size.height())))
+        if self.view.large_graph_mode:
+            rect = rect.united(self.scene.itemsBoundingRect())
+        self.view.setSceneRect(rect)
 
+    def closeEvent(self, event):
+        """Cancela un calculo en curso antes de cerrar la ventana"""
+        if self.ranking_worker is not None:
+            self.ranking_worker.cancel()
+            QThreadPool.globalInstance().waitForDone()
+        super().closeEvent(event)
+    
     def run_model(self):
         """Ejecuta el modelo de optimización con el grafo actual"""
-        graph_data = self.get_current_graph()
+        # El motor del editor sólo recalcula si las ediciones afectan al ranking
+        engine = self.view.engine
+        graph = engine.graph()
+        try:
+            data_processor = backend.Data(graph, engine.factor_set)
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", f"No se pudo calcular el ranking:\n{e}")
+            return
+        self.view.mark_disconnected(data_processor.disconnected_nodes)
+        self.warn_unknown_energy_types(data_processor.unknown_energy_types)
+        ranking = engine.cached_ranking()
+        if ranking is not None:
+            self.show_model_results(ranking)
+            return
+        
+        # Un grafo con el mismo contenido ya calculado (por ejemplo, tras deshacer cambios)
+        revision = engine.revision
+        key = backend.ranking_key(graph, engine.factor_set.factors, top_n=engine.top_n, mode="emissions")
+        ranking = backend.RANKING_CACHE.get(key)
+        if ranking is not None:
+            engine.store_ranking(ranking, revision)
+            self.show_model_results(ranking)
+            return
         
-        # Procesar datos
-        data_processor = backend.Data(graph_data)
-        ranking = data_processor.get_ranking()
+        # Calcular en segundo plano sobre una copia del grafo
+        worker = RankingWorker(data_processor, engine.top_n)
         
-        # Mostrar resultados
+        self.progress_dialog = QProgressDialog("Calculando ranking...", "Cancelar", 0, 0, self)
+        self.progress_dialog.setWindowTitle("Ejecutando modelo")
+        self.progress_dialog.setWindowModality(Qt.WindowModal)
+        self.progress_dialog.setMinimumDuration(300)
+        self.progress_dialog.canceled.connect(worker.cancel)
+        
+        worker.signals.progress.connect(self.update_model_progress)
+        worker.signals.finished.connect(lambda result: self.model_finished(result, revision, key))
+        worker.signals.cancelled.connect(self.close_progress_dialog)
+        worker.signals.failed.connect(self.model_failed)
+        
+        self.ranking_worker = worker
+        self.run_model_action.setEnabled(False)
+        QThreadPool.globalInstance().start(worker)
+    
+    def warn_unknown_energy_types(self, unknown):
+        """Avisa qué nodos usan tipos de energía sin factor (se calculan con emisiones 0)"""
+        if not unknown:
+            return
+        lines = [f"{energy_type}: {', '.join(names)}" for energy_type, names in sorted(unknown.items())]
+        QMessageBox.warning(self, "Tipos de energía sin factor",
+                            "Estos nodos no tienen factor de emisión y se calculan con 0 emisiones:\n"
+                            + "\n".join(lines))
+    
+    def update_model_progress(self, explored, best, pruned=None):
+        """Actualiza el diálogo de progreso con los caminos explorados, los podados y el mejor actual"""
+        text = f"Caminos explorados: {explored}"
+        if pruned is not None:
+            text += f"\nCaminos parciales podados: {pruned}"
+        if best is not None:
+            text += f"\nMejor camino actual: {best:.2f} ton CO2"
+        self.progress_dialog.setLabelText(text)
+    
+    def close_progress_dialog(self):
+        """Cierra el diálogo de progreso y libera el worker"""
+        self.progress_dialog.reset()
+        self.ranking_worker = None
+        self.run_model_action.setEnabled(True)
+    
+    def model_finished(self, ranking, revision, key):
+        """Guarda el ranking en el motor y en la caché, y muestra los resultados"""
+        self.close_progress_dialog()
+        self.view.engine.store_ranking(ranking, revision)
+        backend.RANKING_CACHE.put(key, ranking)
         self.show_model_results(ranking)
     
-    def show_model_results(self, ranking):
+    def model_failed(self, message):
+        """Informa un error durante el calculo del ranking"""
+        self.close_progress_dialog()
+        QMessageBox.warning(self, "Error", f"No se pudo calcular el ranking:\n{message}")
+    
+    def run_pareto(self):
+        """Calcula el frente de Pareto (emisiones vs inversion) del grafo actual"""
+        graph = self.get_current_graph()
+        factor_set = self.view.engine.factor_set
+        try:
+            data_processor = backend.Data(graph, factor_set)
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", f"No se pudo calcular el frente de Pareto:\n{e}")
+            return
+        self.view.mark_disconnected(data_processor.disconnected_nodes)
+        self.warn_unknown_energy_types(data_processor.unknown_energy_types)
+        front = backend.cached_ranking(graph, 20, mode="pareto", factor_set=factor_set)
+        self.show_model_results(front, "Frente de Pareto (Emisiones vs Inversion):")
+    
+    def show_model_results(self, ranking, title="Top 5 Caminos con Menores Emisiones:"):
         """Muestra los resultados del modelo en un cuadro de diálogo"""
-        result_dialog = ResultsDialog(ranking, self, self.dark_mode)
+        result_dialog = ResultsDialog(ranking, self, self.dark_mode, title)
         result_dialog.exec()
     
     def export_results(self, ranking):
@@ -1036,8 +1590,8 @@ class MainWindow(QMainWindow):
         )
         
         if filename:
-            data_processor = backend.Data(self.get_current_graph())
-            if data_processor.export_to_excel(ranking, filename):
+            # Se exporta el ranking ya calculado, sin volver a procesar el grafo
+            if backend.export_to_excel(ranking, filename):
                 QMessageBox.information(self, "Éxito", f"Archivo guardado en:\n{filename}")
             else:
                 QMessageBox.warning(self, "Error", "No se pudo guardar el archivo")
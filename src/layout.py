@@ -0,0 +1,333 @@
+"""
+Disposición automática de grafos
+
+Calcula posiciones para grafos importados o generados que no las traen.
+Las posiciones son centros de nodo en coordenadas de escena, en el mismo
+formato que el campo 'position' de GraphEditor.get_graph_representation.
+
+Dos métodos:
+- layered_layout: disposición por capas (Sugiyama) de izquierda a derecha,
+  de starter a end. Asigna capas por camino más largo (las aristas que
+  cierran ciclos se ignoran), ordena cada capa con barridos de baricentro
+  para reducir cruces y ubica cada nodo cerca de sus predecesores.
+- force_layout: dirigido por fuerzas (Fruchterman-Reingold) para grafos
+  con ciclos o sin starter. La repulsión usa la aproximación de Barnes-Hut
+  sobre un cuadtree implícito (niveles de una grilla), vectorizada con NumPy.
+
+compute_layout elige entre ambos ("auto"): por capas si el grafo tiene
+starter y no tiene ciclos.
+"""
+import math
+
+import numpy as np
+
+LAYER_GAP = 180.0  # Distancia horizontal entre capas
+NODE_GAP = 90.0  # Distancia vertical entre nodos de una capa
+MARGIN = 100.0
+SWEEPS = 4  # Pares de barridos (hacia end y hacia starter) de reducción de cruces
+FORCE_ITERATIONS = 60
+METHODS = ("auto", "layered", "force")
+
+def needs_layout(graph):
+    """Indica si el grafo no trae posiciones útiles (faltan o coinciden todas)"""
+    positions = [node.get('position') for node in graph['nodes']]
+    if not positions:
+        return False
+    return any(position is None for position in positions) or len(set(map(tuple, positions))) == 1
+
+def apply_layout(graph, positions):
+    """Copia del grafo con las posiciones dadas (nombre -> (x, y)) en cada nodo"""
+    nodes = []
+    for node in graph['nodes']:
+        node = dict(node)
+        node['position'] = positions[node['name']]
+        nodes.append(node)
+    return {"nodes": nodes, "edges": graph['edges']}
+
+def compute_layout(graph, method="auto"):
+    """Posiciones (nombre -> (x, y)) con el método indicado"""
+    if method not in METHODS:
+        raise ValueError(f"Método de disposición desconocido: {method}")
+    if method == "auto":
+        names, index, edges = _index_edges(graph)
+        _, forward = _topological_order(len(names), edges)
+        method = "layered" if "starter" in index and len(forward) == len(edges) else "force"
+    if method == "layered":
+        return layered_layout(graph)
+    return force_layout(graph)
+
+def _index_edges(graph):
+    """Nombres de los nodos y aristas como índices enteros (sin aristas repetidas ni bucles)"""
+    names = [node['name'] for node in graph['nodes']]
+    index = {name: i for i, name in enumerate(names)}
+    edges = {(index[edge['source']], index[edge['target']]) for edge in graph['edges']}
+    return names, index, sorted((u, v) for u, v in edges if u != v)
+
+def _topological_order(count, edges):
+    """
+    Orden topológico (Kahn) que tolera ciclos
+    
+    Cuando no quedan nodos sin predecesores pendientes, toma el primero sin
+    visitar en el orden original; sus aristas entrantes pendientes son las
+    que cierran ciclos y se descartan. Devuelve el orden y las aristas que
+    lo respetan.
+    """
+    successors = [[] for _ in range(count)]
+    pending = [0] * count
+    for u, v in edges:
+        successors[u].append(v)
+        pending[v] += 1
+    visited = [False] * count
+    order = []
+    ready = [i for i in range(count) if pending[i] == 0]
+    ready.reverse()
+    cursor = 0
+    while len(order) < count:
+        if not ready:
+            while visited[cursor]:
+                cursor += 1
+            ready.append(cursor)
+        node = ready.pop()
+        if visited[node]:
+            continue
+        visited[node] = True
+        order.append(node)
+        for successor in reversed(successors[node]):
+            pending[successor] -= 1
+            if pending[successor] == 0 and not visited[successor]:
+                ready.append(successor)
+    rank = [0] * count
+    for position, node in enumerate(order):
+        rank[node] = position
+    return order, [(u, v) for u, v in edges if rank[u] < rank[v]]
+
+def _layering(count, edges, index):
+    """
+    Capa de cada nodo y aristas hacia adelante (arreglos de origen y destino)
+    
+    Camino más largo desde las fuentes; luego cada fuente (salvo starter)
+    pasa a la capa anterior a su sucesor más cercano, para no amontonar en
+    la primera capa los nodos sin predecesores. starter queda en la primera
+    capa y end en la última.
+    """
+    order, forward = _topological_order(count, edges)
+    predecessors = [[] for _ in range(count)]
+    for u, v in forward:
+        predecessors[v].append(u)
+    layers = [0] * count
+    for node in order:
+        if predecessors[node]:
+            layers[node] = max(layers[u] for u in predecessors[node]) + 1
+    layers = np.array(layers, dtype=np.int64)
+    sources = np.array([u for u, _ in forward], dtype=np.int64)
+    targets = np.array([v for _, v in forward], dtype=np.int64)
+    
+    nearest = np.full(count, np.iinfo(np.int64).max)
+    np.minimum.at(nearest, sources, layers[targets])
+    pull = (np.bincount(targets, minlength=count) == 0) & (nearest < np.iinfo(np.int64).max)
+    if "starter" in index:
+        pull[index["starter"]] = False
+    layers[pull] = nearest[pull] - 1
+    
+    if "starter" in index:
+        layers[index["starter"]] = 0
+    if "end" in index:
+        others = np.delete(layers, index["end"])
+        layers[index["end"]] = (others.max() + 1) if len(others) else 0
+    # Capas consecutivas desde 0
+    layers = np.unique(layers, return_inverse=True)[1].reshape(-1)
+    keep = layers[sources] < layers[targets]
+    return layers, sources[keep], targets[keep]
+
+def assign_layers(graph):
+    """Capa de cada nodo (índice en graph['nodes']); starter en la primera y end en la última"""
+    names, index, edges = _index_edges(graph)
+    return _layering(len(names), edges, index)[0]
+
+def _barycenter_sweep(members, offsets, centered, slots, sizes, layers, fixed, moving, layer_order):
+    """
+    Un barrido de reducción de cruces: reordena cada capa según el promedio
+    de las posiciones de sus vecinos en las capas ya recorridas
+    
+    fixed y moving son los extremos de las aristas: el vecino ya ubicado y
+    el nodo que se reordena. members[offsets[l]:offsets[l + 1]] son los
+    nodos de la capa l en su orden actual.
+    """
+    group = np.argsort(layers[moving], kind='stable')
+    fixed, moving = fixed[group], moving[group]
+    bounds = np.searchsorted(layers[moving], np.arange(len(sizes) + 1))
+    for layer in layer_order:
+        start, stop = bounds[layer], bounds[layer + 1]
+        if start == stop:
+            continue
+        nodes = members[offsets[layer]:offsets[layer + 1]]
+        local = slots[moving[start:stop]]
+        weights = np.bincount(local, minlength=len(nodes)).astype(float)
+        sums = np.bincount(local, weights=centered[fixed[start:stop]], minlength=len(nodes))
+        current = centered[nodes]
+        barycenter = np.where(weights > 0, sums / np.maximum(weights, 1), current)
+        nodes[:] = nodes[np.lexsort((current, barycenter))]
+        slots[nodes] = np.arange(len(nodes))
+        centered[nodes] = np.arange(len(nodes)) - (len(nodes) - 1) / 2
+
+def layered_layout(graph, layer_gap=LAYER_GAP, node_gap=NODE_GAP, sweeps=SWEEPS):
+    """
+    Disposición por capas (Sugiyama): x según la capa, y según el orden
+    
+    Tras los barridos de baricentro, cada nodo se ubica a la altura media de
+    sus predecesores, respetando el orden de la capa y la separación mínima
+    node_gap. Devuelve un diccionario nombre -> (x, y).
+    """
+    names, index, edges = _index_edges(graph)
+    count = len(names)
+    if not count:
+        return {}
+    layers, sources, targets = _layering(count, edges, index)
+    
+    # Orden inicial: el original dentro de cada capa
+    members = np.argsort(layers, kind='stable')
+    sizes = np.bincount(layers)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    slots = np.empty(count, dtype=np.int64)
+    slots[members] = np.arange(count) - np.repeat(offsets[:-1], sizes)
+    centered = slots - (sizes[layers] - 1) / 2
+    
+    down, up = np.arange(1, len(sizes)), np.arange(len(sizes) - 2, -1, -1)
+    for _ in range(sweeps):
+        _barycenter_sweep(members, offsets, centered, slots, sizes, layers, sources, targets, down)
+        _barycenter_sweep(members, offsets, centered, slots, sizes, layers, targets, sources, up)
+    
+    # Altura: la media de los predecesores, corrida lo justo para separar los nodos
+    group = np.argsort(layers[targets], kind='stable')
+    parents, children = sources[group], targets[group]
+    bounds = np.searchsorted(layers[children], np.arange(len(sizes) + 1))
+    y = centered * node_gap
+    for layer in range(1, len(sizes)):
+        nodes = members[offsets[layer]:offsets[layer + 1]]
+        start, stop = bounds[layer], bounds[layer + 1]
+        local = slots[children[start:stop]]
+        weights = np.bincount(local, minlength=len(nodes)).astype(float)
+        sums = np.bincount(local, weights=y[parents[start:stop]], minlength=len(nodes))
+        desired = np.where(weights > 0, sums / np.maximum(weights, 1), y[nodes])
+        step = np.arange(len(nodes)) * node_gap
+        placed = np.maximum.accumulate(desired - step) + step
+        y[nodes] = placed + (desired - placed).mean()
+    
+    x = MARGIN + layers * layer_gap
+    y = MARGIN + y - y.min()
+    return {name: (px, py) for name, px, py in zip(names, x.tolist(), y.tolist())}
+
+def _interaction_offsets():
+    """
+    Desplazamientos de celda de la lista de interacción de Barnes-Hut según
+    la paridad (x, y) de la celda propia: hijas de las vecinas de la celda
+    padre que no son vecinas de la propia (27 por paridad)
+    """
+    # Por eje: celda par (2a) -> de -2 a 3; celda impar (2a + 1) -> de -3 a 2
+    spans = (range(-2, 4), range(-3, 3))
+    return np.array([[(dx, dy) for dx in spans[px] for dy in spans[py] if max(abs(dx), abs(dy)) > 1]
+                     for px in range(2) for py in range(2)])
+
+_FAR = _interaction_offsets()
+_NEAR = np.array([(dx, dy) for dx in range(-1, 2) for dy in range(-1, 2)])
+_OWN = 4  # Posición de (0, 0) en _NEAR
+_PAD = 3  # Celdas vacías alrededor de la grilla: los desplazamientos nunca salen de ella
+
+def _push(x, y, mass, com_x, com_y, strength):
+    """Repulsión k²/d desde masas puntuales (n x m celdas) hacia cada nodo"""
+    dx = x[:, None] - com_x
+    dy = y[:, None] - com_y
+    distance2 = dx * dx
+    distance2 += dy * dy
+    np.maximum(distance2, np.float32(1e-6), out=distance2)
+    weight = mass * strength
+    weight /= distance2
+    return np.einsum('ij,ij->i', dx, weight), np.einsum('ij,ij->i', dy, weight)
+
+def repulsion(positions, k, levels=None):
+    """
+    Fuerzas de repulsión de Fruchterman-Reingold con Barnes-Hut
+    
+    El cuadtree es implícito: en el nivel l el área se divide en una grilla
+    de 2^l x 2^l celdas. Cada nodo recibe, en cada nivel, la repulsión de
+    las celdas de su lista de interacción tratadas como masas en su centro
+    de masa (celdas a dos o más celdas de distancia, equivalente a un theta
+    de alrededor de 0.7); en el nivel más fino, también la de las celdas
+    vecinas y la de los demás nodos de su propia celda.
+    """
+    count = len(positions)
+    if levels is None:
+        levels = max(2, math.ceil(math.log(max(count, 2), 4)))
+    # En float32 y relativo a la esquina: mitad de memoria y bastante más rápido
+    low = positions.min(axis=0)
+    x, y = (positions - low).astype(np.float32).T
+    span = max(float(np.ptp(positions, axis=0).max()), 1e-9) * (1 + 1e-6)
+    strength = np.float32(k * k)
+    force_x, force_y = np.zeros(count, dtype=np.float32), np.zeros(count, dtype=np.float32)
+    for level in range(2, levels + 1):
+        size = 2 ** level
+        stride = size + 2 * _PAD
+        cell_x = np.minimum((x * (size / span)).astype(np.int64), size - 1)
+        cell_y = np.minimum((y * (size / span)).astype(np.int64), size - 1)
+        flat = (cell_x + _PAD) * stride + cell_y + _PAD
+        mass = np.bincount(flat, minlength=stride * stride)
+        safe = np.maximum(mass, 1)
+        com_x = (np.bincount(flat, weights=x, minlength=stride * stride) / safe).astype(np.float32)
+        com_y = (np.bincount(flat, weights=y, minlength=stride * stride) / safe).astype(np.float32)
+        mass = mass.astype(np.float32)
+        
+        far = flat[:, None] + (_FAR[:, :, 0] * stride + _FAR[:, :, 1])[(cell_x & 1) * 2 + (cell_y & 1)]
+        push_x, push_y = _push(x, y, mass[far], com_x[far], com_y[far], strength)
+        force_x += push_x
+        force_y += push_y
+    
+    # Campo cercano en el nivel más fino; en la propia celda, el centro de
+    # masa de los demás nodos
+    near = flat[:, None] + (_NEAR[:, 0] * stride + _NEAR[:, 1])
+    near_mass, near_x, near_y = mass[near], com_x[near], com_y[near]
+    others = np.maximum(near_mass[:, _OWN] - 1, 0)
+    near_x[:, _OWN] = (near_x[:, _OWN] * near_mass[:, _OWN] - x) / np.maximum(others, 1)
+    near_y[:, _OWN] = (near_y[:, _OWN] * near_mass[:, _OWN] - y) / np.maximum(others, 1)
+    near_mass[:, _OWN] = others
+    push_x, push_y = _push(x, y, near_mass, near_x, near_y, strength)
+    return np.column_stack((force_x + push_x, force_y + push_y)).astype(float)
+
+def force_layout(graph, iterations=FORCE_ITERATIONS, k=LAYER_GAP * 0.75, seed=0, initial=None):
+    """
+    Disposición dirigida por fuerzas (Fruchterman-Reingold)
+    
+    Las aristas atraen a sus extremos con fuerza d²/k y todos los nodos se
+    repelen con k²/d (Barnes-Hut, ver repulsion). El desplazamiento por
+    iteración se limita con una temperatura que decrece. initial permite
+    partir de posiciones dadas (nombre -> (x, y)); si no, se parte de
+    posiciones al azar reproducibles. Devuelve un diccionario nombre -> (x, y).
+    """
+    names, index, edges = _index_edges(graph)
+    count = len(names)
+    if not count:
+        return {}
+    side = k * math.sqrt(count)
+    rng = np.random.default_rng(seed)
+    if initial is None:
+        positions = rng.uniform(0, side, (count, 2))
+    else:
+        positions = np.array([initial[name] for name in names], dtype=float)
+        positions += rng.uniform(-1e-3, 1e-3, positions.shape)  # Separa nodos superpuestos
+    sources = np.array([u for u, _ in edges], dtype=np.int64)
+    targets = np.array([v for _, v in edges], dtype=np.int64)
+    
+    temperature = side / 10
+    cooling = (k / 20 / temperature) ** (1 / max(iterations - 1, 1))
+    for _ in range(iterations):
+        displacement = repulsion(positions, k)
+        delta = positions[targets] - positions[sources]
+        pull = delta * (np.sqrt((delta ** 2).sum(axis=1)) / k)[:, None]
+        for axis in range(2):
+            displacement[:, axis] += (np.bincount(sources, weights=pull[:, axis], minlength=count) -
+                                      np.bincount(targets, weights=pull[:, axis], minlength=count))
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= cooling
+    
+    positions += MARGIN - positions.min(axis=0)
+    return {name: (px, py) for name, (px, py) in zip(names, positions.tolist())}
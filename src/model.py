@@ -63,3 +63,92 @@ def calculate_mu(value, lower_limit, upper_limit, beta, weight):
         return (term1 * (1 - beta) + term2 * beta) ** weight
     else:  # value < lower_limit
         return 1 - beta
+
+T_NORM_TYPES = ("algebraic", "einstein", "hamacher_particular", "hamacher_generic")
+
+def evaluate_carbon_investment_batch(carbon_emissions, investment_cost,
+                                     carbon_lower_limit, carbon_upper_limit,
+                                     cost_lower_limit, cost_upper_limit,
+                                     carbon_weight, cost_weight,
+                                     t_norm_type="algebraic", p_value=0.5):
+    """
+    Versión vectorizada de evaluate_carbon_investment
+    
+    Acepta arrays de NumPy (o escalares) en todos los parámetros numéricos y
+    los combina con broadcasting, por ejemplo un array de emisiones y costos
+    por camino candidato con límites y pesos comunes.
+    
+    Retorna:
+    - Array con tp(μᵢ, μⱼ) por elemento. Para entradas escalares coincide
+      exactamente con evaluate_carbon_investment (con arrays la potencia
+      vectorizada puede diferir en el último bit); donde la versión escalar
+      divide por cero (límites iguales) el resultado es nan.
+    """
+    if t_norm_type not in T_NORM_TYPES:
+        raise ValueError("Tipo de t-norma no válido")
+    
+    carbon_emissions = np.asarray(carbon_emissions, dtype=float)
+    investment_cost = np.asarray(investment_cost, dtype=float)
+    carbon_lower_limit = np.asarray(carbon_lower_limit, dtype=float)
+    cost_lower_limit = np.asarray(cost_lower_limit, dtype=float)
+    
+    # Paso 1: Calcular β para ambos objetivos
+    beta_carbon = np.where(carbon_emissions > carbon_lower_limit, 1.0, 0.0)
+    beta_cost = np.where(investment_cost > cost_lower_limit, 1.0, 0.0)
+    
+    # Paso 2: Calcular los estados μₘ para cada objetivo
+    mu_carbon = calculate_mu_batch(carbon_emissions, carbon_lower_limit, carbon_upper_limit,
+                                   beta_carbon, carbon_weight)
+    mu_cost = calculate_mu_batch(investment_cost, cost_lower_limit, cost_upper_limit,
+                                 beta_cost, cost_weight)
+    
+    # Paso 3: Calcular tp(μᵢ, μⱼ) usando la t-norma elegida
+    return t_norm_batch(mu_carbon, mu_cost, t_norm_type, p_value)
+
+def t_norm_batch(mu_carbon, mu_cost, t_norm_type="algebraic", p_value=0.5):
+    """
+    Aplica la t-norma elegida elemento a elemento sobre arrays de μ
+    """
+    mu_carbon = np.asarray(mu_carbon, dtype=float)
+    mu_cost = np.asarray(mu_cost, dtype=float)
+    product = mu_carbon * mu_cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if t_norm_type == "algebraic":
+            tp_value = product
+        elif t_norm_type == "einstein":
+            tp_value = product / (2 - (mu_carbon + mu_cost - product))
+        elif t_norm_type == "hamacher_particular":
+            tp_value = product / (mu_carbon + mu_cost - product)
+        elif t_norm_type == "hamacher_generic":
+            p_value = np.asarray(p_value, dtype=float)
+            tp_value = product / (p_value + (1 - p_value) * (mu_carbon + mu_cost - product))
+        else:
+            raise ValueError("Tipo de t-norma no válido")
+    return tp_value[()]
+
+def calculate_mu_batch(value, lower_limit, upper_limit, beta, weight):
+    """
+    Versión vectorizada de calculate_mu: las ramas se resuelven con np.where
+    """
+    value = np.asarray(value, dtype=float)
+    lower_limit = np.asarray(lower_limit, dtype=float)
+    upper_limit = np.asarray(upper_limit, dtype=float)
+    beta = np.asarray(beta, dtype=float)
+    weight = np.asarray(weight, dtype=float)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        span = upper_limit - lower_limit
+        term1 = (upper_limit - value) / span
+        term2 = (value - lower_limit) / span
+        base = term1 * (1 - beta) + term2 * beta
+        if base.ndim == 0 and weight.ndim == 0:
+            # Potencia escalar (libm), idéntica a la de calculate_mu
+            inside = np.float64(base) ** np.float64(weight)
+        else:
+            inside = base ** weight
+    # Límites iguales: la versión escalar divide por cero
+    inside = np.where(span == 0, np.nan, inside)
+    
+    mu = np.where(upper_limit < value, 0.0,
+                  np.where(lower_limit <= value, inside, 1 - beta))
+    return mu[()]
@@ -0,0 +1,221 @@
+"""
+Guardado y carga de grafos
+
+Dos formatos:
+- JSON (.json): el diccionario de GraphEditor.get_graph_representation.
+- Binario columnar (.camg): arreglos por nodo (tipo, código de tipo de
+  energía, cantidad, límites, inversión, posición, nombres y descripciones)
+  y aristas en CSR (offsets por nodo origen + destinos). Cada arreglo está
+  alineado a 64 bytes, así que el archivo se puede mapear en memoria y los
+  arreglos se leen sin copiarlos.
+
+Estructura del archivo binario:
+    MAGIC (8 bytes) | largo del encabezado (uint64 little-endian) |
+    encabezado JSON (utf-8) | relleno | arreglos alineados a 64 bytes
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"CAMGRAF1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+NODE_NORMAL = 0
+NODE_SPECIAL = 1
+
+def _align(offset):
+    """Redondea un offset al siguiente múltiplo de ALIGNMENT"""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _pack_strings(strings):
+    """Empaqueta strings en (offsets int64, bytes utf-8)"""
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+def unpack_strings(offsets, blob):
+    """Decodifica strings empaquetados con _pack_strings"""
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+def graph_to_arrays(graph):
+    """Convierte un grafo en diccionario a arreglos columnares (nodos + aristas en CSR)"""
+    nodes = graph['nodes']
+    count = len(nodes)
+    node_ids = {node['name']: i for i, node in enumerate(nodes)}
+
+    energy_types = []
+    energy_codes = {}
+    node_type = np.zeros(count, dtype=np.uint8)
+    energy_code = np.full(count, -1, dtype=np.int16)
+    quantity = np.zeros(count, dtype=np.float64)
+    co2_limits = np.zeros((count, 2), dtype=np.float64)
+    inv_limits = np.zeros((count, 2), dtype=np.float64)
+    inversion = np.zeros(count, dtype=np.float64)
+    position = np.zeros((count, 2), dtype=np.float64)
+
+    for i, node in enumerate(nodes):
+        if node['type'] == 'special':
+            node_type[i] = NODE_SPECIAL
+        else:
+            energy_type = node.get('energy_type', 'N/A')
+            if energy_type not in energy_codes:
+                energy_codes[energy_type] = len(energy_types)
+                energy_types.append(energy_type)
+            energy_code[i] = energy_codes[energy_type]
+        quantity[i] = node.get('quantity', 0.0)
+        co2_limits[i] = node.get('co2_limits', (0.0, 0.0))
+        inv_limits[i] = node.get('inv_limits', (0.0, 0.0))
+        inversion[i] = node.get('inversion', 0.0)
+        position[i] = node.get('position', (0.0, 0.0))
+
+    # Aristas en CSR, ordenadas de forma estable por nodo origen
+    sources = np.array([node_ids[edge['source']] for edge in graph['edges']], dtype=np.int64)
+    targets = np.array([node_ids[edge['target']] for edge in graph['edges']], dtype=np.int32)
+    order = np.argsort(sources, kind='stable')
+    edge_offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=count), out=edge_offsets[1:])
+
+    name_offsets, name_bytes = _pack_strings([node['name'] for node in nodes])
+    desc_offsets, desc_bytes = _pack_strings([node.get('description', '') for node in nodes])
+
+    return {
+        'energy_types': energy_types,
+        'node_type': node_type,
+        'energy_code': energy_code,
+        'quantity': quantity,
+        'co2_limits': co2_limits,
+        'inv_limits': inv_limits,
+        'inversion': inversion,
+        'position': position,
+        'name_offsets': name_offsets,
+        'name_bytes': name_bytes,
+        'desc_offsets': desc_offsets,
+        'desc_bytes': desc_bytes,
+        'edge_offsets': edge_offsets,
+        'edge_targets': targets[order],
+    }
+
+def arrays_to_graph(arrays):
+    """Convierte arreglos columnares al diccionario de get_graph_representation"""
+    names = unpack_strings(arrays['name_offsets'], arrays['name_bytes'])
+    descriptions = unpack_strings(arrays['desc_offsets'], arrays['desc_bytes'])
+    energy_types = arrays['energy_types']
+    node_type = arrays['node_type'].tolist()
+    energy_code = arrays['energy_code'].tolist()
+    quantity = arrays['quantity'].tolist()
+    co2_limits = arrays['co2_limits'].tolist()
+    inv_limits = arrays['inv_limits'].tolist()
+    inversion = arrays['inversion'].tolist()
+    position = arrays['position'].tolist()
+
+    nodes = []
+    for i, name in enumerate(names):
+        nodes.append({
+            "name": name,
+            "type": "special" if node_type[i] == NODE_SPECIAL else "normal",
+            "energy_type": energy_types[energy_code[i]] if energy_code[i] >= 0 else 'N/A',
+            "quantity": quantity[i],
+            "co2_limits": co2_limits[i],
+            "inv_limits": inv_limits[i],
+            "inversion": inversion[i],
+            "description": descriptions[i],
+            "position": tuple(position[i])
+        })
+
+    offsets = arrays['edge_offsets'].tolist()
+    targets = arrays['edge_targets'].tolist()
+    edges = []
+    for source in range(len(names)):
+        for target in targets[offsets[source]:offsets[source + 1]]:
+            edges.append({
+                "source": names[source],
+                "target": names[target],
+                "direction": "unidirectional"
+            })
+    return {"nodes": nodes, "edges": edges}
+
+def save_arrays(arrays, filename):
+    """Escribe arreglos columnares en el formato binario alineado"""
+    names = [name for name in arrays if name != 'energy_types']
+    header = {
+        "version": FORMAT_VERSION,
+        "energy_types": arrays['energy_types'],
+        "arrays": {}
+    }
+    # Los offsets dependen del largo del encabezado: se recalcula hasta que no cambie
+    header_bytes = b""
+    while True:
+        offset = _align(len(MAGIC) + 8 + len(header_bytes))
+        for name in names:
+            array = np.ascontiguousarray(arrays[name])
+            header["arrays"][name] = {
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": offset
+            }
+            offset = _align(offset + array.nbytes)
+        encoded = json.dumps(header).encode("utf-8")
+        stable = len(encoded) == len(header_bytes)
+        header_bytes = encoded
+        if stable:
+            break
+    with open(filename, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name in names:
+            array = np.ascontiguousarray(arrays[name])
+            f.write(b"\0" * (header["arrays"][name]["offset"] - f.tell()))
+            f.write(array.tobytes())
+
+def load_arrays(filename, mmap=True):
+    """Lee un archivo binario; con mmap=True los arreglos son vistas del archivo mapeado"""
+    with open(filename, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} no es un grafo binario de Camaleon")
+        header_length, = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length).decode("utf-8"))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Versión de formato no soportada: {header.get('version')}")
+
+    if mmap:
+        raw = np.memmap(filename, dtype=np.uint8, mode="r")
+    else:
+        raw = np.fromfile(filename, dtype=np.uint8)
+
+    arrays = {'energy_types': header["energy_types"]}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = spec["offset"]
+        arrays[name] = raw[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return arrays
+
+def is_binary(filename):
+    """Indica si el archivo usa el formato binario (por extensión)"""
+    return os.path.splitext(filename)[1].lower() != ".json"
+
+def save_graph(graph, filename):
+    """Guarda un grafo en JSON o en binario según la extensión (.json / .camg)"""
+    if is_binary(filename):
+        save_arrays(graph_to_arrays(graph), filename)
+        return
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(graph, f, ensure_ascii=False)
+
+def load_graph(filename):
+    """Carga un grafo guardado con save_graph como diccionario"""
+    if is_binary(filename):
+        return arrays_to_graph(load_arrays(filename))
+    with open(filename, encoding="utf-8") as f:
+        graph = json.load(f)
+    for node in graph['nodes']:
+        if 'position' in node:
+            node['position'] = tuple(node['position'])
+    return graph